@@ -1,28 +1,74 @@
 # account/backend.py
-from django.contrib.auth.backends import BaseBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from account.models import Student
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from core import metrics
 
 User = get_user_model()
 
-class StudentOrAdminAuthBackend(BaseBackend):
-    def authenticate(self, request, username=None, password=None, **kwargs):
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop the cached snapshot of a user, e.g. once their profile has changed."""
+    if settings.AUTH_USER_CACHE_TIMEOUT:
+        cache.delete(user_cache_key(user_id))
+
+
+class StudentOrAdminAuthBackend(ModelBackend):
+    """
+    Students sign in with their index number, staff and admins with their email.
+    Permissions come from ModelBackend, so this is the only backend configured.
+    """
+
+    def authenticate(self, request, username=None, password=None, index_number=None, **kwargs):
+        if index_number is None and username is not None and '@' not in username:
+            index_number = username
         try:
-            if '@' in username:
+            if index_number is not None:
+                # Index number -> user -> profile in one joined query
+                user = User.objects.select_related('student_profile').get(
+                    student_profile__index_number=index_number
+                )
+            elif username is not None:
                 # Admin/staff login via email
                 user = User.objects.get(email=username)
             else:
-                # Student login via index_number
-                student = Student.objects.select_related('user').get(index_number=username)
-                user = student.user
-
-            if user and user.check_password(password):
-                return user
-        except (User.DoesNotExist, Student.DoesNotExist):
+                return None
+        except User.DoesNotExist:
+            # Hash anyway so a missing account takes as long as a wrong password
+            with metrics.timer('password_hash'):
+                User().set_password(password)
             return None
 
+        with metrics.timer('password_hash'):
+            password_valid = user.check_password(password)
+        if password_valid and self.user_can_authenticate(user):
+            return user
+        # Stop authenticate() here rather than trying (and hashing in) any other backend
+        raise PermissionDenied
+
     def get_user(self, user_id):
+        """
+        Load the session's user with both profiles in one query, so views can check
+        student_profile / staff_profile without further queries. With
+        AUTH_USER_CACHE_TIMEOUT set, the loaded user is also cached for that many
+        seconds; saving the User or Student, or sealing their ballot, drops it.
+        """
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        if timeout:
+            user = cache.get(user_cache_key(user_id))
+            metrics.cache_lookup('auth_user', user is not None)
+            if user is not None:
+                return user if self.user_can_authenticate(user) else None
         try:
-            return User.objects.get(pk=user_id)
+            user = User.objects.select_related('student_profile', 'staff_profile').get(pk=user_id)
         except User.DoesNotExist:
             return None
+        if timeout:
+            cache.set(user_cache_key(user_id), user, timeout)
+        return user if self.user_can_authenticate(user) else None
@@ -2,7 +2,6 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import authenticate
-from .models import Student, User
 
 class StudentLoginForm(forms.Form):
     index_number = forms.CharField(label='Index Number')
@@ -13,14 +12,11 @@ class StudentLoginForm(forms.Form):
         index_number = cleaned_data.get("index_number")
         password = cleaned_data.get("password")
 
-        try:
-            student = Student.objects.get(index_number=index_number)
-            user = authenticate(username=student.user.email, password=password)
-            if user is None:
-                raise forms.ValidationError("Invalid credentials")
-            cleaned_data["user"] = user
-        except Student.DoesNotExist:
-            raise forms.ValidationError("Student not found")
+        # The backend resolves the index number, user and profile in one query
+        user = authenticate(index_number=index_number, password=password)
+        if user is None:
+            raise forms.ValidationError("Invalid credentials")
+        cleaned_data["user"] = user
         return cleaned_data
 
 
@@ -0,0 +1,113 @@
+import statistics
+import threading
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from account import turnout
+from account.models import Department, Student, User
+
+BENCH_PREFIX = 'BENCHLOGIN'
+BENCH_PASSWORD = 'benchPass1234'
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate the login surge at election open: many students logging in through the "
+        "student login view at once, some with wrong passwords. Reports p50/p99 latency and "
+        "queries per login. Temporary students are created and removed again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20, help="Simultaneous login threads.")
+        parser.add_argument('--failure-rate', type=float, default=0.1, help="Share of attempts with a wrong password.")
+
+    def handle(self, *args, **options):
+        department, created_department = Department.objects.get_or_create(name='Login Benchmark')
+        # One hash shared by every bench student keeps setup fast; logins still verify it in full
+        password = make_password(BENCH_PASSWORD)
+        users = User.objects.bulk_create(
+            User(email=f"{BENCH_PREFIX.lower()}{n}@students.edu", password=password)
+            for n in range(options['students'])
+        )
+        students = Student.objects.bulk_create(
+            Student(
+                user=user, index_number=f"{BENCH_PREFIX}{n}", first_name='Bench', last_name=str(n),
+                year_group='0000', department=department,
+            )
+            for n, user in enumerate(users)
+        )
+        # Deleting them afterwards goes through the signals, so count them in
+        turnout.add_students(students)
+        try:
+            self._report_queries()
+            self._surge(options)
+        finally:
+            User.objects.filter(email__startswith=BENCH_PREFIX.lower(), email__endswith='@students.edu').delete()
+            if created_department:
+                department.delete()
+
+    def _login(self, client, n, correct):
+        return client.post(reverse('student_login'), {
+            'index_number': f"{BENCH_PREFIX}{n}",
+            'password': BENCH_PASSWORD if correct else 'wrongPass',
+        })
+
+    def _report_queries(self):
+        for label, correct in (('successful', True), ('failed', False)):
+            with CaptureQueriesContext(connection) as queries:
+                self._login(Client(HTTP_HOST='localhost'), 0, correct)
+            self.stdout.write(f"Queries per {label} login: {len(queries)}")
+
+    def _surge(self, options):
+        students = options['students']
+        failures_every = round(1 / options['failure_rate']) if options['failure_rate'] else 0
+        latencies = {True: [], False: []}
+        next_student = iter(range(students))
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['concurrency'])
+
+        def worker():
+            client = Client(HTTP_HOST='localhost')
+            barrier.wait()
+            while True:
+                with lock:
+                    n = next(next_student, None)
+                if n is None:
+                    break
+                correct = not (failures_every and n % failures_every == 0)
+                started = time.perf_counter()
+                response = self._login(client, n, correct)
+                elapsed = time.perf_counter() - started
+                if correct and response.status_code != 302:
+                    self.stderr.write(f"Login {n} failed with status {response.status_code}")
+                latencies[correct].append(elapsed)
+            connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{students} logins from {options['concurrency']} threads in {elapsed:.1f}s "
+            f"({students / elapsed:.1f} logins/s)"
+        )
+        for label, correct in (('successful', True), ('failed', False)):
+            samples = sorted(latencies[correct])
+            if samples:
+                self.stdout.write(
+                    f"{label:>10}: {len(samples)} logins, p50 {statistics.median(samples) * 1000:.0f}ms, "
+                    f"p99 {percentile(samples, 0.99) * 1000:.0f}ms"
+                )
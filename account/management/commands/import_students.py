@@ -0,0 +1,147 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from account import turnout
+from account.models import Department, Student, User
+
+REQUIRED_FIELDS = ('index_number', 'first_name', 'last_name', 'year_group', 'department')
+DEFAULT_PASSWORD = 'ranPass1234'
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def student_email(index_number):
+    # Same address StudentAdmin.save_model gives a student
+    return f"{index_number.lower()}@students.edu"
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a student roster from CSV or NDJSON. Rows whose index_number already exists are "
+        "skipped, so an interrupted import can simply be run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Roster file; columns index_number, first_name, other_name, last_name, year_group, department and optionally password.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes to hash passwords with.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Students inserted per transaction.")
+        parser.add_argument(
+            '--default-password', default=DEFAULT_PASSWORD,
+            help="Password for rows without one.",
+        )
+
+    def _read(self, path, file_format):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            if file_format == 'csv':
+                yield from enumerate(csv.DictReader(f), 2)
+            else:
+                for line_number, line in enumerate(f, 1):
+                    if line.strip():
+                        try:
+                            row = json.loads(line)
+                        except ValueError as e:
+                            raise CommandError(f"Line {line_number}: invalid JSON ({e}).")
+                        if not isinstance(row, dict):
+                            raise CommandError(f"Line {line_number}: expected a JSON object, got {type(row).__name__}.")
+                        yield line_number, row
+
+    def _validate(self, rows):
+        departments = {department.name: department.id for department in Department.objects.all()}
+        errors = []
+        seen = set()
+        valid = []
+        for line_number, row in rows:
+            row = {key.strip(): str(value).strip() for key, value in row.items() if key and value is not None}
+            missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+            if missing:
+                errors.append(f"Line {line_number}: missing {', '.join(missing)}")
+            elif row['department'] not in departments:
+                errors.append(f"Line {line_number}: unknown department {row['department']!r}")
+            elif row['index_number'] in seen:
+                errors.append(f"Line {line_number}: duplicate index number {row['index_number']}")
+            else:
+                seen.add(row['index_number'])
+                row['department_id'] = departments[row['department']]
+                valid.append(row)
+        return valid, errors
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        started = time.perf_counter()
+
+        # Validate the whole roster before writing anything
+        rows, errors = self._validate(self._read(path, file_format))
+        if errors:
+            for error in errors[:50]:
+                self.stderr.write(error)
+            raise CommandError(f"{len(errors)} invalid row{'s' if len(errors) != 1 else ''}; nothing was imported.")
+
+        existing = set(Student.objects.values_list('index_number', flat=True))
+        taken_emails = set(
+            User.objects.filter(email__endswith='@students.edu').values_list('email', flat=True)
+        )
+        new_rows = []
+        conflicts = 0
+        for row in rows:
+            if row['index_number'] in existing:
+                continue
+            if student_email(row['index_number']) in taken_emails:
+                self.stderr.write(f"{row['index_number']}: a user with its email exists without a student; skipped.")
+                conflicts += 1
+                continue
+            new_rows.append(row)
+        skipped = len(rows) - len(new_rows) - conflicts
+
+        passwords = (row.get('password') or options['default_password'] for row in new_rows)
+        created = 0
+        if new_rows:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                # Hashes stream back in order while earlier batches are being inserted
+                hashes = pool.map(make_password, passwords, chunksize=64)
+                for start in range(0, len(new_rows), options['batch_size']):
+                    batch = new_rows[start:start + options['batch_size']]
+                    created += self._insert(batch, islice(hashes, len(batch)))
+                    self.stdout.write(f"{created}/{len(new_rows)} students imported", ending='\r')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} students, skipped {skipped} already present"
+            f"{f', {conflicts} conflicting' if conflicts else ''} in {elapsed:.1f}s "
+            f"({len(rows) / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+
+    def _insert(self, batch, hashes):
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(email=student_email(row['index_number']), password=password, is_active=True)
+                for row, password in zip(batch, hashes)
+            )
+            students = Student.objects.bulk_create(
+                Student(
+                    user=user,
+                    index_number=row['index_number'],
+                    first_name=row['first_name'],
+                    other_name=row.get('other_name', ''),
+                    last_name=row['last_name'],
+                    year_group=row['year_group'],
+                    department_id=row['department_id'],
+                )
+                for row, user in zip(batch, users)
+            )
+            # bulk_create sends no signals
+            turnout.add_students(students)
+        return len(batch)
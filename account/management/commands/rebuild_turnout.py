@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from account import turnout
+from account.models import TurnoutCounter
+
+
+class Command(BaseCommand):
+    help = "Recount turnout from the Student table, report drift against the stored counters and rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report drift; leave the counters untouched.")
+
+    def handle(self, *args, **options):
+        stored = {
+            (counter.department_id, counter.year_group): (counter.students, counter.voted)
+            for counter in TurnoutCounter.objects.all()
+        }
+        counted = turnout.recount()
+
+        drift = 0
+        for key in sorted(stored.keys() | counted.keys()):
+            if stored.get(key, (0, 0)) != counted.get(key, (0, 0)):
+                drift += 1
+                department_id, year_group = key
+                self.stdout.write(
+                    f"Department {department_id}, year group {year_group}: "
+                    f"counters {stored.get(key, (0, 0))}, students {counted.get(key, (0, 0))} (students, voted)"
+                )
+
+        if drift:
+            self.stdout.write(self.style.WARNING(f"{drift} turnout group{'s' if drift != 1 else ''} drifted."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Turnout counters match the students."))
+
+        if options['check']:
+            return
+        groups = turnout.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Turnout counters rebuilt for {groups} groups."))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def seed_turnout(apps, schema_editor):
+    Student = apps.get_model('account', 'Student')
+    TurnoutCounter = apps.get_model('account', 'TurnoutCounter')
+    groups = Student.objects.values('department_id', 'year_group').annotate(
+        students=Count('id'), voted=Count('id', filter=Q(has_voted=True))
+    )
+    TurnoutCounter.objects.bulk_create(TurnoutCounter(**group) for group in groups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoutCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_group', models.CharField(max_length=10)),
+                ('students', models.IntegerField(default=0)),
+                ('voted', models.IntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='account.department')),
+            ],
+            options={
+                'unique_together': {('department', 'year_group')},
+            },
+        ),
+        migrations.RunPython(seed_turnout, migrations.RunPython.noop),
+    ]
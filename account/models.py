@@ -76,3 +76,18 @@ class Student(models.Model):
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.index_number})"
+
+
+class TurnoutCounter(models.Model):
+    # Students and voters per department and year group, kept up to date as students
+    # are added, removed or vote (see account.turnout), so turnout needs no COUNT(*).
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    year_group = models.CharField(max_length=10)
+    students = models.IntegerField(default=0)
+    voted = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('department', 'year_group')
+
+    def __str__(self):
+        return f"{self.department} {self.year_group}: {self.voted}/{self.students}"
@@ -0,0 +1,41 @@
+# account/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import turnout
+from .backends import forget_user
+from .models import Staff, Student, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_saved_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def forget_profile_user(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+@receiver(pre_save, sender=Student)
+def remember_turnout_group(sender, instance, raw=False, **kwargs):
+    # What the row counted towards before this save, so post_save can move it
+    instance._turnout_previous = None
+    if instance.pk and not raw:
+        instance._turnout_previous = (
+            Student.objects.filter(pk=instance.pk).values_list('department_id', 'year_group', 'has_voted').first()
+        )
+
+
+@receiver(post_save, sender=Student)
+def update_turnout(sender, instance, raw=False, **kwargs):
+    if not raw:
+        turnout.student_changed(instance._turnout_previous, instance)
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_turnout(sender, instance, **kwargs):
+    turnout.add_students([instance], sign=-1)
@@ -1,3 +1,157 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from . import turnout
+from .backends import StudentOrAdminAuthBackend
+from .models import Department, Staff, Student, TurnoutCounter, User
 
-# Create your tests here.
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportStudentsTests(TransactionTestCase):
+    def setUp(self):
+        Department.objects.create(name='Computer Science')
+
+    def _roster(self, *rows):
+        roster = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        roster.write('index_number,first_name,last_name,year_group,department,password\n')
+        roster.writelines(f'{row}\n' for row in rows)
+        roster.close()
+        self.addCleanup(os.remove, roster.name)
+        return roster.name
+
+    def test_import_is_idempotent_on_index_number(self):
+        roster = self._roster(
+            'CS0001,Ama,Mensah,2025,Computer Science,',
+            'CS0002,Kofi,Boateng,2025,Computer Science,secret123',
+        )
+        call_command('import_students', roster, workers=1, stdout=StringIO())
+        call_command('import_students', roster, workers=1, stdout=StringIO())
+
+        self.assertEqual(Student.objects.count(), 2)
+        student = Student.objects.select_related('user').get(index_number='CS0002')
+        self.assertEqual(student.user.email, 'cs0002@students.edu')
+        self.assertTrue(student.user.check_password('secret123'))
+
+    def test_unknown_department_rejects_the_whole_roster(self):
+        roster = self._roster(
+            'CS0001,Ama,Mensah,2025,Computer Science,',
+            'CS0002,Kofi,Boateng,2025,Medicine,',
+        )
+        with self.assertRaises(CommandError):
+            call_command('import_students', roster, workers=1, stderr=StringIO())
+        self.assertFalse(Student.objects.exists())
+
+    def test_ndjson_line_that_is_not_an_object_is_rejected(self):
+        roster = tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False)
+        roster.write('{"index_number": "CS0001", "first_name": "Ama", "last_name": "Mensah", '
+                     '"year_group": 2025, "department": "Computer Science"}\n')
+        roster.write('["CS0002", "Kofi", "Boateng"]\n')
+        roster.close()
+        self.addCleanup(os.remove, roster.name)
+
+        with self.assertRaisesMessage(CommandError, 'Line 2: expected a JSON object'):
+            call_command('import_students', roster.name, workers=1, stderr=StringIO())
+        self.assertFalse(Student.objects.exists())
+
+
+class CountingHasher(MD5PasswordHasher):
+    verified = 0
+
+    def verify(self, password, encoded):
+        CountingHasher.verified += 1
+        return super().verify(password, encoded)
+
+
+@override_settings(PASSWORD_HASHERS=['account.tests.CountingHasher'])
+class StudentLoginTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(email='cs0001@students.edu', password=make_password('secret123'))
+        Student.objects.create(
+            user=user, index_number='CS0001', first_name='Ama', last_name='Mensah',
+            year_group='2025', department=Department.objects.create(name='Computer Science'),
+        )
+        CountingHasher.verified = 0
+
+    def test_login_resolves_student_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = authenticate(index_number='CS0001', password='secret123')
+        self.assertEqual(user.student_profile.index_number, 'CS0001')
+
+    def test_failed_login_hashes_once(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(index_number='CS0001', password='wrong'))
+        self.assertEqual(CountingHasher.verified, 1)
+
+
+@override_settings(
+    AUTH_USER_CACHE_TIMEOUT=60,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class UserCacheTests(TestCase):
+    def test_cached_user_is_dropped_when_the_student_changes(self):
+        user = User.objects.create(email='cs0001@students.edu')
+        student = Student.objects.create(
+            user=user, index_number='CS0001', first_name='Ama', last_name='Mensah',
+            year_group='2025', department=Department.objects.create(name='Computer Science'),
+        )
+        backend = StudentOrAdminAuthBackend()
+        with self.assertNumQueries(1):
+            loaded = backend.get_user(user.pk)
+            self.assertFalse(hasattr(loaded, 'staff_profile'))
+            self.assertFalse(loaded.student_profile.has_voted)
+        with self.assertNumQueries(0):
+            backend.get_user(user.pk)
+
+        student.has_voted = True
+        student.save()
+        self.assertTrue(backend.get_user(user.pk).student_profile.has_voted)
+
+
+class TurnoutTests(TestCase):
+    def stored(self):
+        return {
+            (counter.department_id, counter.year_group): (counter.students, counter.voted)
+            for counter in TurnoutCounter.objects.exclude(students=0, voted=0)
+        }
+
+    def test_counters_follow_students_without_counting_them(self):
+        computing = Department.objects.create(name='Computer Science')
+        business = Department.objects.create(name='Business')
+        students = [
+            Student.objects.create(
+                user=User.objects.create(email=f'cs{n}@students.edu'), index_number=f'CS{n}',
+                first_name='Ama', last_name=str(n), year_group='2025', department=computing,
+            )
+            for n in range(4)
+        ]
+        # As when a ballot is sealed: a queryset update, so no signals
+        Student.objects.filter(pk=students[0].pk).update(has_voted=True)
+        turnout.record_votes([students[0].pk])
+        students[1].year_group = '2026'
+        students[1].has_voted = True
+        students[1].save()
+        students[2].department = business
+        students[2].save()
+        students[3].user.delete()
+
+        self.assertEqual(self.stored(), turnout.recount())
+        with self.assertNumQueries(1):
+            summary = turnout.summary()
+        self.assertEqual(summary['overall'], {'name': 'All students', 'students': 3, 'voted': 2, 'percentage': 66.7})
+        self.assertEqual([entry['name'] for entry in summary['year_groups']], ['2025', '2026'])
+
+    def test_staff_profile_without_staff_flag_is_refused_not_looped(self):
+        user = User.objects.create(email='clerk@staff.edu')
+        Staff.objects.create(user=user, first_name='Ama', last_name='Clerk')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('index'))
+        self.assertRedirects(response, reverse('staff_dashboard'), fetch_redirect_response=False)
+        response = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(response.status_code, 403)
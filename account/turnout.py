@@ -0,0 +1,115 @@
+# account/turnout.py
+"""
+Turnout counters. TurnoutCounter holds students and voters per department and
+year group. Single Student saves and deletes keep it current through
+account.signals; paths that bypass signals (the has_voted update when a ballot
+is sealed or queued, and bulk imports) call record_votes / add_students in their
+own transaction.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Q
+from .models import Student, TurnoutCounter
+
+
+def _apply(students=None, voted=None):
+    # students / voted: Counters of (department_id, year_group) -> change
+    students, voted = students or Counter(), voted or Counter()
+    with transaction.atomic():
+        for key in students.keys() | voted.keys():
+            department_id, year_group = key
+            changes = {'students': F('students') + students[key], 'voted': F('voted') + voted[key]}
+            rows = TurnoutCounter.objects.filter(department_id=department_id, year_group=year_group)
+            if not rows.update(**changes):
+                TurnoutCounter.objects.get_or_create(department_id=department_id, year_group=year_group)
+                rows.update(**changes)
+
+
+def add_students(students, sign=1):
+    """Count students created (or, with sign=-1, removed) without going through Student.save()."""
+    counts, voted = Counter(), Counter()
+    for student in students:
+        key = (student.department_id, student.year_group)
+        counts[key] += sign
+        if student.has_voted:
+            voted[key] += sign
+    _apply(counts, voted)
+
+
+def record_votes(student_ids):
+    """Count the given students as having voted; call in the transaction that set their has_voted."""
+    groups = Student.objects.filter(pk__in=student_ids).values('department_id', 'year_group').annotate(n=Count('id'))
+    _apply(voted=Counter({(group['department_id'], group['year_group']): group['n'] for group in groups}))
+
+
+def student_changed(previous, student):
+    """Move a saved student's counts from its previous (department_id, year_group, has_voted) to its current ones."""
+    students, voted = Counter(), Counter()
+    if previous:
+        department_id, year_group, has_voted = previous
+        students[(department_id, year_group)] -= 1
+        voted[(department_id, year_group)] -= has_voted
+    students[(student.department_id, student.year_group)] += 1
+    voted[(student.department_id, student.year_group)] += student.has_voted
+    _apply(
+        students=Counter({key: n for key, n in students.items() if n}),
+        voted=Counter({key: n for key, n in voted.items() if n}),
+    )
+
+
+def recount():
+    """Count students and voters per group from Student: {(department_id, year_group): (students, voted)}."""
+    groups = Student.objects.values('department_id', 'year_group').annotate(
+        students=Count('id'), voted=Count('id', filter=Q(has_voted=True))
+    )
+    return {(group['department_id'], group['year_group']): (group['students'], group['voted']) for group in groups}
+
+
+def rebuild():
+    """Replace the counters with a fresh recount. Returns the number of groups."""
+    with transaction.atomic():
+        counts = recount()
+        TurnoutCounter.objects.all().delete()
+        TurnoutCounter.objects.bulk_create(
+            TurnoutCounter(department_id=department_id, year_group=year_group, students=students, voted=voted)
+            for (department_id, year_group), (students, voted) in counts.items()
+        )
+    return len(counts)
+
+
+def summary():
+    """
+    Turnout overall, per department (with its year groups) and per year group,
+    from the counters alone: one query however many students there are.
+    """
+    def entry(name, students, voted):
+        return {
+            'name': name,
+            'students': students,
+            'voted': voted,
+            'percentage': round(voted / students * 100, 1) if students else 0,
+        }
+
+    departments = {}
+    year_groups = Counter()
+    year_group_votes = Counter()
+    for counter in TurnoutCounter.objects.select_related('department').order_by('department__name', 'year_group'):
+        department = departments.setdefault(counter.department_id, {
+            'name': counter.department.name, 'students': 0, 'voted': 0, 'year_groups': [],
+        })
+        department['students'] += counter.students
+        department['voted'] += counter.voted
+        department['year_groups'].append(entry(counter.year_group, counter.students, counter.voted))
+        year_groups[counter.year_group] += counter.students
+        year_group_votes[counter.year_group] += counter.voted
+
+    total = sum(department['students'] for department in departments.values())
+    total_voted = sum(department['voted'] for department in departments.values())
+    return {
+        'overall': entry('All students', total, total_voted),
+        'departments': [
+            dict(entry(department['name'], department['students'], department['voted']), year_groups=department['year_groups'])
+            for department in departments.values()
+        ],
+        'year_groups': [entry(name, year_groups[name], year_group_votes[name]) for name in sorted(year_groups)],
+    }
@@ -0,0 +1,214 @@
+# core/metrics.py
+"""
+Request and operation metrics in Prometheus text format (METRICS_ENABLED).
+
+``metrics_middleware`` records per-view latency, and for synchronous views the
+number and total duration of the ORM queries they ran. Code times named
+operations with ``with metrics.timer('name'):`` and counts cache lookups with
+``metrics.cache_lookup('name', hit)``. Everything is kept in memory, so each
+worker process reports its own numbers; Prometheus sums them across targets.
+
+When METRICS_ENABLED is off the middleware removes itself from the chain, timers
+are a shared no-op context manager and nothing is recorded.
+"""
+import bisect
+import contextlib
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+from asgiref.sync import iscoroutinefunction
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+_lock = threading.Lock()
+_disabled = contextlib.nullcontext()
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name, self.help_text, self.labelnames = name, help_text, labelnames
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        with _lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.series.items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name, self.help_text, self.labelnames, self.buckets = name, help_text, labelnames, buckets
+        # labels -> [count per bucket ..., count above the last bucket, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        for labels, series in sorted(self.series.items()):
+            labels = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': str(bound)}, cumulative
+            yield f'{self.name}_sum', labels, series[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+REQUEST_SECONDS = Histogram(
+    'votingsystem_request_duration_seconds', "Time to produce a response, per view.",
+    ('view', 'method'), DURATION_BUCKETS,
+)
+REQUESTS = Counter('votingsystem_requests_total', "Responses sent, per view and status.", ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'votingsystem_request_queries', "Database queries per request (synchronous views).", ('view',), QUERY_BUCKETS,
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    'votingsystem_request_query_seconds', "Time spent in database queries per request (synchronous views).",
+    ('view',), DURATION_BUCKETS,
+)
+OPERATION_SECONDS = Histogram(
+    'votingsystem_operation_seconds', "Time spent in named operations (crypto, hashing, sealing).",
+    ('operation',), DURATION_BUCKETS,
+)
+CACHE_LOOKUPS = Counter('votingsystem_cache_lookups_total', "Cache lookups, per cache and result.", ('cache', 'result'))
+
+REGISTRY = (REQUEST_SECONDS, REQUESTS, REQUEST_QUERIES, REQUEST_QUERY_SECONDS, OPERATION_SECONDS, CACHE_LOOKUPS)
+
+
+class _Timer:
+    __slots__ = ('operation', 'started')
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        OPERATION_SECONDS.observe((self.operation,), time.perf_counter() - self.started)
+
+
+def timer(operation):
+    """Context manager recording how long its block takes under ``operation``."""
+    if not settings.METRICS_ENABLED:
+        return _disabled
+    return _Timer(operation)
+
+
+def cache_lookup(cache_name, hit):
+    if settings.METRICS_ENABLED:
+        CACHE_LOOKUPS.inc((cache_name, 'hit' if hit else 'miss'))
+
+
+class _QueryRecorder:
+    # connection.execute_wrapper hook counting this request's queries
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _record(request, response, seconds, queries=None):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    REQUEST_SECONDS.observe((view, request.method), seconds)
+    REQUESTS.inc((view, request.method, str(response.status_code)))
+    if queries is not None:
+        REQUEST_QUERIES.observe((view,), queries.count)
+        REQUEST_QUERY_SECONDS.observe((view,), queries.seconds)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Time every request. Streaming responses are timed up to their first byte."""
+    if not settings.METRICS_ENABLED:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            # Queries of async views run on other threads' connections and are not counted
+            _record(request, response, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            queries = _QueryRecorder()
+            with connection.execute_wrapper(queries):
+                response = get_response(request)
+            _record(request, response, time.perf_counter() - started, queries)
+            return response
+    return middleware
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _results_cache_samples():
+    # Counted in memory by the results cache itself, per process like the rest
+    from votingSystem import results_cache
+    counts = results_cache.stats()
+    yield 'votingsystem_results_cache_total', 'counter', "Results cache lookups and rebuilds.", [
+        ({'result': result}, value) for result, value in counts.items()
+    ]
+    lookups = counts['hits'] + counts['stale'] + counts['misses']
+    yield 'votingsystem_results_cache_hit_ratio', 'gauge', "Share of results cache lookups answered fresh.", [
+        ({}, counts['hits'] / lookups if lookups else 0),
+    ]
+
+
+def render():
+    lines = []
+    with _lock:
+        families = [(metric, list(metric.samples())) for metric in REGISTRY]
+    for metric, samples in families:
+        kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+        lines += [f'# HELP {metric.name} {metric.help_text}', f'# TYPE {metric.name} {kind}']
+        lines += [f'{name}{_format_labels(labels)} {value}' for name, labels, value in samples]
+    for name, kind, help_text, samples in _results_cache_samples():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{_format_labels(labels)} {value}' for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: staff sessions, or a bearer METRICS_TOKEN for the scraper."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    by_token = bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+    if not by_token and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse("Staff only.", status=403, content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,16 +86,79 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Migration votingSystem.0009 switches the SQLite file to WAL journaling once
+# (`manage.py migrate` on deploy); the mode is stored in the file itself and
+# leaves db.sqlite3-wal / db.sqlite3-shm beside it while connections are open.
+# Migrating the checked-in db.sqlite3 therefore changes it.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts rather than upgrading a
+            # read lock mid-transaction, so concurrent voters queue instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # A file rather than shared in-memory database, so concurrent tests lock like production
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Group commit: seal ballots that arrive within VOTE_GROUP_COMMIT_WINDOW seconds of each
+# other (up to VOTE_GROUP_COMMIT_MAX_BALLOTS) into a single block and transaction
+VOTE_GROUP_COMMIT = False
+VOTE_GROUP_COMMIT_MAX_BALLOTS = 50
+VOTE_GROUP_COMMIT_WINDOW = 0.05
+
+# Ballot queue: acknowledge a vote once its encrypted ballot is fsync'd to
+# VOTE_QUEUE_PATH, and let `manage.py seal_ballots` put queued ballots on the chain
+# (up to VOTE_QUEUE_BATCH per block). A logged ballot whose transaction never
+# committed is skipped after VOTE_QUEUE_ABANDON_AFTER seconds.
+VOTE_QUEUE = False
+VOTE_QUEUE_PATH = BASE_DIR / 'ballot_queue.log'
+VOTE_QUEUE_BATCH = 500
+VOTE_QUEUE_ABANDON_AFTER = 60
+
+# Older blocks re-hashed at random on each incremental blockchain verification
+BLOCKCHAIN_VERIFY_SAMPLE = 25
+
+# Live results push over Server-Sent Events (/results/stream/). Only enable it when
+# the site is served through core.asgi: under WSGI a stream never sends a byte and
+# pins a worker for as long as the tab stays open. Without it the results page
+# polls /results.json every RESULTS_POLL_INTERVAL seconds (unchanged polls get a 304).
+RESULTS_PUSH_ENABLED = False
+RESULTS_POLL_INTERVAL = 10
+
+# Live results streams: how often each process checks the tally for new blocks, and
+# the longest a stream stays silent before sending a keep-alive
+RESULTS_PUSH_INTERVAL = 1.0
+RESULTS_PUSH_HEARTBEAT = 15
+
+# Seconds between the staff turnout dashboard's polls
+TURNOUT_POLL_INTERVAL = 5
+
+# Request and operation metrics, served in Prometheus text format at /metrics to
+# staff, or to a scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_ENABLED = False
+METRICS_TOKEN = ''
+
+# Shared by every worker process on the host, so the results tally and ballot
+# definitions are built once rather than once per worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Seconds to cache each signed-in user (with their profile) between requests; 0 disables
+AUTH_USER_CACHE_TIMEOUT = 0
+
 AUTHENTICATION_BACKENDS = [
     'account.backends.StudentOrAdminAuthBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 
@@ -141,6 +205,19 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Production asset mode (on whenever DEBUG is off): `collectstatic` writes
+# content-hashed, precompressed copies to STATIC_ROOT, and Django serves them and
+# MEDIA_ROOT itself with long cache lifetimes (see votingSystem.assets)
+SERVE_ASSETS = not DEBUG
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'votingSystem.assets.CompressedManifestStaticFilesStorage' if SERVE_ASSETS
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -14,15 +14,25 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from core import metrics
+from votingSystem import assets
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('votingSystem.urls')),
-    path("accounts/", include('account.urls'))
+    path("accounts/", include('account.urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.SERVE_ASSETS:
+    urlpatterns += [
+        re_path(r'^%s/(?P<path>.+)$' % re.escape(settings.STATIC_URL.strip('/')), assets.serve_static),
+        re_path(r'^%s/(?P<path>.+)$' % re.escape(settings.MEDIA_URL.strip('/')), assets.serve_media),
+    ]
+else:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
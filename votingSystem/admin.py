@@ -1,21 +1,117 @@
 # votingSystem/admin.py
+import json
+import random
+from django.conf import settings
 from django.contrib import admin
 from django.contrib import messages
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.decorators import permission_required
-from .models import Block, Category, Candidate
-import hashlib
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.db.models import OuterRef, Q, Subquery
+from core import metrics
+from .models import Block, Category, Candidate, ChainCheckpoint, ChainTip
+from .ballots import unpack_ballots
+from .chain import GENESIS_HASH, calculate_hash
+
+VERIFY_CHUNK_SIZE = 2000
+STREAM_ROWS_MARKER = '<!-- verification rows -->'
+STREAM_SUMMARY_MARKER = '<!-- verification summary -->'
+
+BEFORE_VAR = 'before'
+AFTER_VAR = 'after'
+
+
+class BlockChangeList(ChangeList):
+    """
+    Keyset pagination for the block list: pages seek on the unique, indexed
+    ``index`` column (?before=/?after=) instead of using OFFSET, and the total comes
+    from the chain tip instead of COUNT(*), so every page costs the same however
+    long the chain is.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for cursor in (BEFORE_VAR, AFTER_VAR):
+            lookup_params.pop(cursor, None)
+        return lookup_params
+
+    def _cursor(self, request, name):
+        try:
+            return int(request.GET[name])
+        except (KeyError, ValueError):
+            return None
+
+    def get_results(self, request):
+        before = self._cursor(request, BEFORE_VAR)
+        after = self._cursor(request, AFTER_VAR)
+        queryset = self.queryset
+        if after is not None:
+            page = list(queryset.filter(index__gt=after).order_by('index')[:self.list_per_page + 1])
+            has_newer, has_older = len(page) > self.list_per_page, True
+            page = page[:self.list_per_page][::-1]
+        else:
+            if before is not None:
+                queryset = queryset.filter(index__lt=before)
+            page = list(queryset.order_by('-index')[:self.list_per_page + 1])
+            has_newer, has_older = before is not None, len(page) > self.list_per_page
+            page = page[:self.list_per_page]
+
+        tip = ChainTip.objects.filter(pk=1).first()
+        full_result_count = tip.index if tip else 0
+        if self.query or self.has_active_filters:
+            # Bounded count: enough to say "N" or "more than N" without a full scan
+            result_count = self.queryset[:self.list_max_show_all + 1].count()
+            self.result_count_capped = result_count > self.list_max_show_all
+        else:
+            result_count = full_result_count
+            self.result_count_capped = False
+
+        remove = [BEFORE_VAR, AFTER_VAR]
+        self.newer_url = self.get_query_string({AFTER_VAR: page[0].index}, remove) if page and has_newer else None
+        self.older_url = self.get_query_string({BEFORE_VAR: page[-1].index}, remove) if page and has_older else None
+        self.result_count = result_count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.result_list = page
+        self.can_show_all = False
+        self.multi_page = has_newer or has_older
+        self.paginator = Paginator(page, self.list_per_page)
+
 
 @admin.register(Block)
 class BlockAdmin(admin.ModelAdmin):
     list_display = ('index', 'timestamp', 'hash', 'previous_hash', 'verify_status')
     search_fields = ('hash', 'previous_hash')
+    search_help_text = 'Search by the start of a block hash or previous hash.'
     readonly_fields = ('index', 'timestamp', 'hash', 'previous_hash', 'vote_data')
-    ordering = ('-timestamp',)
+    ordering = ('-index',)
+    # Pages are keyed on index, so other orderings are not offered
+    sortable_by = ()
     list_per_page = 25
-    actions = ['verify_blockchain']
+    actions = ['verify_blockchain', 'full_blockchain_audit']
+
+    def get_changelist(self, request, **kwargs):
+        return BlockChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().lower()
+        if not term:
+            return queryset, False
+        if any(c not in '0123456789abcdef' for c in term):
+            return queryset.none(), False
+        # Hashes are lowercase hex, so a prefix match is a range that any backend can
+        # answer from the column's B-tree index (unlike LIKE '%term%')
+        upper = term + 'g'
+        return queryset.filter(
+            Q(hash__gte=term, hash__lt=upper) | Q(previous_hash__gte=term, previous_hash__lt=upper)
+        ), False
 
     def has_add_permission(self, request):
         return False
@@ -33,53 +129,143 @@ class BlockAdmin(admin.ModelAdmin):
                 ),
                 name='verify_blockchain',
             ),
+            path(
+                'verify-blockchain/stream/',
+                self.admin_site.admin_view(
+                    permission_required('votingSystem.can_verify_blockchain')(self.verify_blockchain_stream_view)
+                ),
+                name='verify_blockchain_stream',
+            ),
         ]
         return custom_urls + urls
 
-    def _verify_blockchain(self):
-        blocks = Block.objects.order_by('index')
-        results = []
+    def _check_block(self, block, previous_block):
+        with metrics.timer('block_hash'):
+            calculated_hash = calculate_hash(block.index, block.timestamp, block.vote_data, block.previous_hash)
+        hash_valid = calculated_hash == block.hash
+
+        previous_hash_valid = True
+        if previous_block:
+            previous_hash_valid = block.previous_hash == previous_block.hash
+        elif block.index == 1:
+            previous_hash_valid = block.previous_hash == GENESIS_HASH
+
+        status = 'Valid'
+        errors = []
+        if not hash_valid:
+            status = 'Invalid'
+            errors.append(f'Hash mismatch (calculated: {calculated_hash})')
+        if not previous_hash_valid:
+            status = 'Invalid'
+            errors.append('Previous hash mismatch')
+        try:
+            ballots = len(unpack_ballots(block.vote_data))
+        except ValueError:
+            ballots = 0
+            status = 'Invalid'
+            errors.append('Malformed ballot list')
+
+        return {
+            'index': block.index,
+            'timestamp': block.timestamp,
+            'hash': block.hash,
+            'previous_hash': block.previous_hash,
+            'ballots': ballots,
+            'status': status,
+            'errors': errors,
+            'calculated_hash': calculated_hash if not hash_valid else None,
+        }
+
+    def _iter_verification(self, summary, full=False, sample_size=0):
+        """
+        Verify the chain, yielding one result dict per block checked. A full audit
+        re-hashes every block. Otherwise only blocks appended since the last
+        checkpoint are re-hashed, plus ``sample_size`` randomly chosen older blocks
+        as a spot check. ``summary`` is filled in as blocks are checked, and a run
+        that finishes cleanly records a new checkpoint at the last block it walked.
+        A checkpoint whose block is gone or has changed is reported as a failure and
+        the whole chain is checked instead. Blocks are read in chunks, so memory
+        does not grow with the chain.
+        """
+        checkpoint = None if full else ChainCheckpoint.objects.order_by('-index').first()
+        summary.update(full=full, checkpoint=checkpoint, checked=0, sampled=0, failures=0, first_failure=None)
+
+        def record(result):
+            if result.get('sampled'):
+                summary['sampled'] += 1
+            else:
+                summary['checked'] += 1
+            if result['status'] != 'Valid':
+                summary['failures'] += 1
+                if summary['first_failure'] is None or result['index'] < summary['first_failure']:
+                    summary['first_failure'] = result['index']
+            return result
+
         previous_block = None
+        blocks = Block.objects.order_by('index')
 
-        for block in blocks:
-            # Format timestamp consistently
-            timestamp_str = block.timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00')
-            block_data = f"{block.index}{timestamp_str}{block.vote_data}{block.previous_hash}"
-            calculated_hash = hashlib.sha256(block_data.encode()).hexdigest()
-            hash_valid = calculated_hash == block.hash
-
-            previous_hash_valid = True
-            if previous_block:
-                previous_hash_valid = block.previous_hash == previous_block.hash
-            elif block.index == 1:
-                previous_hash_valid = block.previous_hash == '0' * 64
-
-            status = 'Valid'
-            errors = []
-            if not hash_valid:
-                status = 'Invalid'
-                errors.append(f'Hash mismatch (calculated: {calculated_hash})')
-            if not previous_hash_valid:
-                status = 'Invalid'
-                errors.append('Previous hash mismatch')
-
-            results.append({
-                'index': block.index,
-                'timestamp': block.timestamp,
-                'hash': block.hash,
-                'previous_hash': block.previous_hash,
-                'status': status,
-                'errors': errors,
-                'calculated_hash': calculated_hash if not hash_valid else None,
-            })
+        if checkpoint:
+            checkpoint_block = Block.objects.filter(index=checkpoint.index).first()
+            if checkpoint_block is None or checkpoint_block.hash != checkpoint.hash:
+                yield record({
+                    'index': checkpoint.index,
+                    'timestamp': checkpoint.verified_at,
+                    'hash': checkpoint_block.hash if checkpoint_block else '',
+                    'previous_hash': checkpoint_block.previous_hash if checkpoint_block else '',
+                    'ballots': 0,
+                    'status': 'Invalid',
+                    'errors': [f'Block no longer matches the checkpoint hash {checkpoint.hash}; run a full audit'],
+                    'calculated_hash': None,
+                })
+                # Nothing before this point can be vouched for any more: check every block
+                checkpoint = summary['checkpoint'] = None
+            else:
+                yield record(self._check_block(checkpoint_block, None))
+                previous_block = checkpoint_block
+                blocks = blocks.filter(index__gt=checkpoint.index)
 
+        for block in blocks.iterator(chunk_size=VERIFY_CHUNK_SIZE):
+            yield record(self._check_block(block, previous_block))
             previous_block = block
 
-        return results
+        if checkpoint and sample_size and checkpoint.index > 1:
+            indexes = random.sample(range(1, checkpoint.index), min(sample_size, checkpoint.index - 1))
+            sample_blocks = {
+                block.index: block
+                for block in Block.objects.filter(index__in=indexes + [index - 1 for index in indexes])
+            }
+            for index in sorted(indexes):
+                if index in sample_blocks:
+                    result = self._check_block(sample_blocks[index], sample_blocks.get(index - 1))
+                    result['sampled'] = True
+                    yield record(result)
 
-    def verify_blockchain(self, request, queryset=None):
-        verification_results = self._verify_blockchain()
-        if all(result['status'] == 'Valid' for result in verification_results):
+        if summary['failures']:
+            if full:
+                # Checkpoints past the first bad block vouch for a tampered chain
+                ChainCheckpoint.objects.filter(index__gte=summary['first_failure']).delete()
+        elif previous_block and (not checkpoint or previous_block.index > checkpoint.index):
+            ChainCheckpoint.objects.create(index=previous_block.index, hash=previous_block.hash, full_audit=full)
+
+    def _verify_blockchain(self, full=False, sample_size=0):
+        summary = {}
+        results = list(self._iter_verification(summary, full=full, sample_size=sample_size))
+        return results, summary
+
+    def _verification_options(self, request):
+        full = request.GET.get('full') == '1'
+        try:
+            sample_size = int(request.GET.get('sample', settings.BLOCKCHAIN_VERIFY_SAMPLE))
+        except ValueError:
+            sample_size = settings.BLOCKCHAIN_VERIFY_SAMPLE
+        return full, sample_size
+
+    def verify_blockchain(self, request, queryset=None, full=None):
+        requested_full, sample_size = self._verification_options(request)
+        if full is None:
+            full = requested_full
+        verification_results, summary = self._verify_blockchain(full=full, sample_size=sample_size)
+        if summary['first_failure'] is None:
             self.message_user(request, "Blockchain verification successful: All blocks are valid.", level=messages.SUCCESS)
         else:
             self.message_user(
@@ -89,24 +275,94 @@ class BlockAdmin(admin.ModelAdmin):
             )
         context = {
             'results': verification_results,
+            'summary': summary,
             'title': 'Blockchain Verification Results',
         }
         return render(request, 'block/verify_blockchain.html', context)
 
     verify_blockchain.short_description = "Verify blockchain integrity"
 
+    def full_blockchain_audit(self, request, queryset=None):
+        return self.verify_blockchain(request, full=True)
+
+    full_blockchain_audit.short_description = "Full blockchain audit"
+
     def verify_blockchain_view(self, request):
         return self.verify_blockchain(request)
 
+    def verify_blockchain_stream_view(self, request):
+        """
+        Stream the verification report as it is produced, as HTML rows or, with
+        ?format=ndjson, one JSON object per line with periodic progress lines. Pass
+        ?failures=1 to stream only failing blocks. The summary (totals and first
+        failure) comes last.
+        """
+        full, sample_size = self._verification_options(request)
+        failures_only = request.GET.get('failures') == '1'
+        summary = {}
+        results = self._iter_verification(summary, full=full, sample_size=sample_size)
+
+        if request.GET.get('format') == 'ndjson':
+            response = StreamingHttpResponse(
+                self._stream_ndjson(results, summary, failures_only), content_type='application/x-ndjson'
+            )
+        else:
+            response = StreamingHttpResponse(self._stream_html(request, results, summary, failures_only))
+        # Keep proxies from buffering the whole report
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _stream_ndjson(self, results, summary, failures_only=False):
+        # Progress counts blocks checked rather than lines sent, so a failures-only
+        # stream of a healthy chain still shows it moving
+        for checked, result in enumerate(results, 1):
+            if not failures_only or result['status'] != 'Valid':
+                yield json.dumps(result, cls=DjangoJSONEncoder) + '\n'
+            if checked % VERIFY_CHUNK_SIZE == 0:
+                yield json.dumps({'progress': self._summary_dict(summary)}) + '\n'
+        yield json.dumps({'summary': self._summary_dict(summary)}) + '\n'
+
+    def _stream_html(self, request, results, summary, failures_only=False):
+        page = render_to_string(
+            'block/verify_blockchain_stream.html',
+            {'title': 'Blockchain Verification Results', **self.admin_site.each_context(request)},
+            request=request,
+        )
+        head, rest = page.split(STREAM_ROWS_MARKER)
+        table_end, tail = rest.split(STREAM_SUMMARY_MARKER)
+        yield head
+        row = get_template('block/verify_blockchain_row.html')
+        for result in results:
+            if not failures_only or result['status'] != 'Valid':
+                yield row.render({'result': result})
+        yield table_end
+        # The summary is only known once every row has been produced
+        yield get_template('block/verify_blockchain_summary.html').render({'summary': summary, 'streamed': True})
+        yield tail
+
+    def _summary_dict(self, summary):
+        return {
+            'full': summary['full'],
+            'checkpoint': summary['checkpoint'].index if summary['checkpoint'] else None,
+            'checked': summary['checked'],
+            'sampled': summary['sampled'],
+            'failures': summary['failures'],
+            'first_failure': summary['first_failure'],
+        }
+
+    def get_queryset(self, request):
+        # Fetch each row's predecessor hash with the page itself, so verify_status
+        # needs no query per row
+        predecessor = Block.objects.filter(index=OuterRef('index') - 1).values('hash')[:1]
+        return super().get_queryset(request).annotate(predecessor_hash=Subquery(predecessor))
+
     def verify_status(self, obj):
-        timestamp_str = obj.timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00')
-        block_data = f"{obj.index}{timestamp_str}{obj.vote_data}{obj.previous_hash}"
-        calculated_hash = hashlib.sha256(block_data.encode()).hexdigest()
+        with metrics.timer('block_hash'):
+            calculated_hash = calculate_hash(obj.index, obj.timestamp, obj.vote_data, obj.previous_hash)
         hash_valid = calculated_hash == obj.hash
-        previous_block = Block.objects.filter(index=obj.index - 1).first()
         previous_hash_valid = (
-            (previous_block and obj.previous_hash == previous_block.hash)
-            or (obj.index == 1 and obj.previous_hash == '0' * 64)
+            (obj.predecessor_hash is not None and obj.previous_hash == obj.predecessor_hash)
+            or (obj.index == 1 and obj.previous_hash == GENESIS_HASH)
         )
         if hash_valid and previous_hash_valid:
             return format_html('<span style="color: green;">Valid</span>')
@@ -0,0 +1,188 @@
+# votingSystem/assets.py
+"""
+Production asset serving (SERVE_ASSETS). ``collectstatic`` writes content-hashed
+copies of every static file to STATIC_ROOT, along with gzip (and, when the brotli
+package is installed, brotli) variants of the text assets. ``serve_static`` and
+``serve_media`` then serve STATIC_ROOT and MEDIA_ROOT from the Django process with
+ETags, byte ranges and the precompressed variants. Hashed static files and
+uploaded candidate photos never change under the same name, so they are sent as
+immutable; everything else is revalidated hourly.
+"""
+import functools
+import gzip
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+# Upload names are never reused (the storage suffixes clashing names), so these are safe to cache forever
+IMMUTABLE_MEDIA = ('candidates/',)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _compress(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        # Not worth a variant unless it saves a meaningful share
+        if len(compressed) < len(data) * 0.9:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files, plus .gz/.br variants of the compressible ones."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE):
+                _compress(self.path(name))
+
+
+@functools.cache
+def _hashed_names():
+    # The manifest is read once per process, as the static storage itself does
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def _byte_range(header, size):
+    """Return (start, end) for a single satisfiable range, None to send the whole file, or False if unsatisfiable."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        # Several ranges or an unknown unit: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _accepts_encoding(header, coding):
+    """Whether an Accept-Encoding header allows ``coding``, honouring q=0 refusals and ``*``."""
+    qualities = {}
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities.get(coding, qualities.get('*', 0.0)) > 0
+
+
+class _RangeFile:
+    # Reads ``length`` bytes from ``start``; FileResponse streams it in blocks
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _serve(request, path, document_root, cache_control):
+    # Raises SuspiciousFileOperation (a 400) for paths escaping document_root
+    full_path = safe_join(document_root, path)
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if encoding:
+        # Serve e.g. a .tar.gz as the archive it is, not as gzip transfer encoding
+        content_type = 'application/gzip' if encoding == 'gzip' else 'application/octet-stream'
+
+    # Pick a precompressed variant unless the client wants a byte range of the file itself
+    variant, content_encoding = full_path, None
+    if 'HTTP_RANGE' not in request.META:
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if _accepts_encoding(accepted, name) and os.path.isfile(full_path + suffix):
+                variant, content_encoding = full_path + suffix, name
+                break
+
+    stat = os.stat(variant)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    if content_encoding:
+        # Each encoding is its own representation with its own validator
+        etag = f'{etag[:-1]}-{content_encoding}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if 'HTTP_RANGE' in request.META and (if_range is None or if_range == etag):
+            byte_range = _byte_range(request.META['HTTP_RANGE'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            response = FileResponse(
+                _RangeFile(variant, start, end - start + 1), status=206,
+                content_type=content_type, filename=os.path.basename(full_path),
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(variant, 'rb'), content_type=content_type, filename=os.path.basename(full_path))
+            response['Content-Length'] = stat.st_size
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    if os.path.isfile(full_path + '.gz') or os.path.isfile(full_path + '.br'):
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def serve_static(request, path):
+    """Serve a collected static file; only content-hashed names are cached forever."""
+    cache_control = IMMUTABLE if path in _hashed_names() else REVALIDATE
+    return _serve(request, path, settings.STATIC_ROOT, cache_control)
+
+
+def serve_media(request, path):
+    """Serve an uploaded file; candidate photos are cached forever."""
+    cache_control = IMMUTABLE if path.startswith(IMMUTABLE_MEDIA) else REVALIDATE
+    return _serve(request, path, settings.MEDIA_ROOT, cache_control)
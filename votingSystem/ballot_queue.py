@@ -0,0 +1,178 @@
+# votingSystem/ballot_queue.py
+"""
+Write-ahead ballot queue (VOTE_QUEUE). A vote is acknowledged once its encrypted
+ballot is fsync'd to an append-only log on local disk and the voter is marked as
+having voted; the seal_ballots command later puts queued ballots on the chain in
+log order.
+
+Each log record is one JSON line: {"id": ..., "ballot": ..., "at": ...}. The
+record is written inside the transaction that flips has_voted and creates its
+QueuedBallot marker, so the marker (committed or not) is what decides a record's
+fate: with a marker it is sealed, without one it was never acknowledged and is
+skipped once it is older than VOTE_QUEUE_ABANDON_AFTER. A committed ballot that
+cannot be decrypted (say, queued under a since-replaced FERNET_KEY) is quarantined
+on its marker rather than blocking the records behind it. BallotQueueState holds
+the log offset up to which everything is settled, and advances in the same
+transaction as the block, so a crashed sealer simply replays from there.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from account import turnout
+from account.models import Student
+from core import metrics
+from . import chain, tally
+from .ballots import AlreadyVoted, decrypt_ballot, get_cipher, pack_ballots
+from .models import BallotQueueState, QueuedBallot
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+
+
+def _append(line):
+    path = os.fspath(settings.VOTE_QUEUE_PATH)
+    with _write_lock:
+        created = not os.path.exists(path)
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                # A crash tore the last record; end it so this one starts on a fresh line
+                line = b'\n' + line
+            # One write per record: O_APPEND keeps records from several processes whole
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if created:
+            # Make the new file's directory entry durable too
+            dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+
+def read_log(offset, limit):
+    """
+    Return up to ``limit`` (record, end offset) pairs from the log, starting at byte
+    ``offset``. Unreadable lines come back as None records so they can be skipped;
+    a final line without its newline is still being written, or was torn, and is
+    left for later.
+    """
+    try:
+        f = open(settings.VOTE_QUEUE_PATH, 'rb')
+    except FileNotFoundError:
+        return []
+    records = []
+    with f:
+        f.seek(offset)
+        while len(records) < limit:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Unreadable ballot queue record ending at byte %s", offset)
+                record = None
+            records.append((record, offset))
+    return records
+
+
+def enqueue(student_id, encrypted_vote):
+    """
+    Durably queue a voter's ballot. has_voted, the QueuedBallot marker and the log
+    record all land before the transaction commits; raises AlreadyVoted (writing
+    nothing) if the student has already voted. Returns the provisional receipt.
+    """
+    ballot_id = uuid.uuid4().hex
+    queued_at = timezone.now()
+    with transaction.atomic():
+        if not Student.objects.filter(pk=student_id, has_voted=False).update(has_voted=True):
+            raise AlreadyVoted()
+        turnout.record_votes([student_id])
+        QueuedBallot.objects.create(ballot_id=ballot_id, queued_at=queued_at)
+        record = {'id': ballot_id, 'ballot': encrypted_vote, 'at': queued_at.timestamp()}
+        _append(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+    return {'ballot_id': ballot_id, 'queued_at': queued_at}
+
+
+def _quarantine(record, error):
+    # Keep the ciphertext on the marker so the ballot can be recovered by hand
+    logger.error("Ballot %s cannot be decrypted (%r); quarantining it", record['id'], error)
+    QueuedBallot.objects.filter(ballot_id=record['id']).update(
+        ballot=str(record.get('ballot', '')),
+        error=repr(error)[:200],
+        failed_at=timezone.now(),
+    )
+
+
+def seal_pending(batch_size=None, abandon_after=None):
+    """
+    Seal the next run of queued ballots as one block. Stops early at a record whose
+    transaction may still be open. Returns (ballots sealed, records skipped,
+    ballots quarantined).
+    """
+    batch_size = batch_size or settings.VOTE_QUEUE_BATCH
+    if abandon_after is None:
+        abandon_after = settings.VOTE_QUEUE_ABANDON_AFTER
+    cipher = get_cipher()
+    BallotQueueState.load()
+    with transaction.atomic():
+        state = BallotQueueState.objects.select_for_update().get(pk=1)
+        records = read_log(state.offset, batch_size)
+        committed = set(QueuedBallot.objects.filter(
+            ballot_id__in=[record['id'] for record, _ in records if record]
+        ).values_list('ballot_id', flat=True))
+
+        offset = state.offset
+        now = time.time()
+        pending = []
+        skipped = 0
+        for record, end in records:
+            if record and record['id'] in committed:
+                pending.append(record)
+            elif record and now - record['at'] < abandon_after:
+                break
+            else:
+                if record:
+                    logger.warning("Ballot %s was never committed; skipping it", record['id'])
+                skipped += 1
+            offset = end
+
+        sealed = []
+        votes = []
+        failed = []
+        with metrics.timer('ballot_decrypt'):
+            for record in pending:
+                try:
+                    votes.append(decrypt_ballot(record['ballot'], cipher))
+                except (InvalidToken, AttributeError, KeyError, TypeError, ValueError) as e:
+                    failed.append((record, e))
+                else:
+                    sealed.append(record)
+        for record, error in failed:
+            _quarantine(record, error)
+
+        if sealed:
+            ballots = [record['ballot'] for record in sealed]
+            chain.append_block(
+                pack_ballots(ballots),
+                on_append=lambda block: tally.record_block(block, votes),
+            )
+            QueuedBallot.objects.filter(ballot_id__in=[record['id'] for record in sealed]).delete()
+        if offset != state.offset:
+            BallotQueueState.objects.filter(pk=1).update(offset=offset)
+    return len(sealed), skipped, len(failed)
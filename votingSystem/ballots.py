@@ -0,0 +1,98 @@
+# votingSystem/ballots.py
+"""
+Ballot encoding and encryption. A ballot is encrypted from a compact binary
+plaintext: a format version byte followed by (category_id, candidate_id) pairs as
+LEB128 varints, so a typical ballot is a couple of bytes per category instead of
+a JSON object. Ballots sealed before the binary format were JSON objects; their
+plaintext always starts with '{', which no binary version byte uses, so both
+decode transparently.
+"""
+import json
+from cryptography.fernet import Fernet
+from django.conf import settings
+
+BALLOT_FORMAT = 1
+
+
+def get_cipher():
+    return Fernet(settings.FERNET_KEY)
+
+
+def _write_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_ballot(votes):
+    """Encode a {category_id: candidate_id} ballot as binary plaintext."""
+    out = bytearray([BALLOT_FORMAT])
+    for category_id, candidate_id in sorted(votes.items()):
+        _write_varint(int(category_id), out)
+        _write_varint(int(candidate_id), out)
+    return bytes(out)
+
+
+def decode_ballot_pairs(plaintext):
+    """
+    Decode binary or legacy JSON plaintext into a flat list of ints
+    [category_id, candidate_id, category_id, candidate_id, ...].
+    """
+    if plaintext[:1] == b'{':
+        votes = json.loads(plaintext)
+        return [int(value) for pair in votes.items() for value in pair]
+    if plaintext[:1] != bytes([BALLOT_FORMAT]):
+        raise ValueError(f"Unknown ballot format {plaintext[:1]!r}")
+    values = []
+    value = shift = 0
+    for byte in plaintext[1:]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    if shift or len(values) % 2:
+        raise ValueError("Truncated ballot")
+    return values
+
+
+def decode_ballot(plaintext):
+    """Decode binary or legacy JSON plaintext into a {category_id: candidate_id} dict of ints."""
+    values = decode_ballot_pairs(plaintext)
+    return dict(zip(values[::2], values[1::2]))
+
+
+def encrypt_ballot(votes, cipher=None):
+    """Encrypt a {category_id: candidate_id} ballot into the text stored on a Block."""
+    cipher = cipher or get_cipher()
+    return cipher.encrypt(encode_ballot(votes)).decode()
+
+
+def decrypt_ballot(vote_data, cipher=None):
+    """Decrypt a stored ballot back into a {category_id: candidate_id} dict of ints."""
+    cipher = cipher or get_cipher()
+    return decode_ballot(cipher.decrypt(vote_data.encode()))
+
+
+class AlreadyVoted(Exception):
+    """Raised when a ballot arrives for a student who has already voted."""
+
+
+def pack_ballots(encrypted_ballots):
+    """
+    Build a block's vote_data from one or more encrypted ballots. A single ballot is
+    stored as-is; a group-committed block stores a JSON list of ballots.
+    """
+    if len(encrypted_ballots) == 1:
+        return encrypted_ballots[0]
+    return json.dumps(encrypted_ballots)
+
+
+def unpack_ballots(vote_data):
+    """Return the list of encrypted ballots held in a block's vote_data."""
+    # Fernet tokens are urlsafe base64 and can never start with '['
+    if vote_data.startswith('['):
+        return json.loads(vote_data)
+    return [vote_data]
@@ -0,0 +1,88 @@
+# votingSystem/chain.py
+import hashlib
+import threading
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from . import merkle
+from .ballots import unpack_ballots
+from .models import Block, ChainTip, MerkleNode
+
+GENESIS_HASH = '0' * 64
+
+# Appends from threads of the same process queue here instead of all spinning on the
+# database lock; the database lock still sequences appends across processes.
+_append_lock = threading.Lock()
+
+
+def format_timestamp(timestamp):
+    return timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00')
+
+
+def calculate_hash(index, timestamp, vote_data, previous_hash):
+    block_data = f"{index}{format_timestamp(timestamp)}{vote_data}{previous_hash}"
+    return hashlib.sha256(block_data.encode()).hexdigest()
+
+
+def _advance_tip():
+    # The UPDATE comes first so the transaction takes the write lock (SQLite) or the
+    # row lock (other backends) before it reads the tip.
+    if not ChainTip.objects.filter(pk=1).update(index=F('index') + 1):
+        last_block = Block.objects.order_by('-index').first()
+        ballots = last_block.ballot_offset + len(unpack_ballots(last_block.vote_data)) if last_block else 0
+        ChainTip.objects.create(
+            pk=1,
+            index=(last_block.index if last_block else 0) + 1,
+            hash=last_block.hash if last_block else GENESIS_HASH,
+            ballots=ballots,
+            merkle_root=merkle.root(ballots),
+        )
+    return ChainTip.objects.get(pk=1)
+
+
+def append_block(vote_data, on_append=None):
+    """
+    Append ``vote_data`` (already encrypted) as the next block of the chain.
+
+    The index and previous hash are assigned under a lock on the ChainTip row, so
+    concurrent appends always produce a linear chain, and the block's ballots are
+    added to the Merkle tree in the same step. ``on_append(block)`` runs in
+    the same transaction before the lock is released; if it raises, the block is
+    rolled back. Keep anything expensive (encryption especially) out of it.
+    """
+    # Leaf hashes are computed up front; only the tree update happens under the lock
+    leaves = [merkle.leaf_hash(ballot) for ballot in unpack_ballots(vote_data)]
+    with _append_lock, transaction.atomic():
+        tip = _advance_tip()
+        timestamp = timezone.now()
+        block = Block.objects.create(
+            index=tip.index,
+            timestamp=timestamp,
+            vote_data=vote_data,
+            previous_hash=tip.hash,
+            hash=calculate_hash(tip.index, timestamp, vote_data, tip.hash),
+            ballot_offset=tip.ballots,
+        )
+        ChainTip.objects.filter(pk=1).update(
+            hash=block.hash,
+            ballots=tip.ballots + len(leaves),
+            merkle_root=merkle.append_leaves(tip.ballots, leaves),
+        )
+        if on_append:
+            on_append(block)
+    return block
+
+
+def find_ballot(encrypted_vote):
+    """
+    Locate a ballot from a voter's receipt. Returns (block, position in block), or
+    (None, None). Uses the indexed Merkle leaf digests rather than scanning vote_data,
+    so the cost does not grow with the chain.
+    """
+    leaf = MerkleNode.objects.filter(level=0, hash=merkle.leaf_hash(encrypted_vote)).first()
+    if leaf is None:
+        return None, None
+    block = Block.objects.filter(ballot_offset__lte=leaf.position).order_by('-ballot_offset').first()
+    if block is None:
+        return None, None
+    return block, leaf.position - block.ballot_offset
@@ -0,0 +1,70 @@
+# votingSystem/definitions.py
+"""
+Precomputed ballot definitions. A department's ballot (its eligible categories,
+their candidates and photo thumbnail URLs, and the set of valid candidate ids per category)
+is built once and cached under a version number that the signals in
+``votingSystem.signals`` bump whenever a Category, Candidate or Department changes,
+so rendering the ballot and validating a submission need no queries.
+"""
+import time
+from django.core.cache import cache
+from django.db.models import Prefetch
+from core import metrics
+from . import thumbnails
+from .models import Category, Candidate
+
+VERSION_KEY = 'ballot_definitions_version'
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # resurrect definitions cached under an earlier run's numbers
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def build(department_id):
+    categories = (
+        Category.objects.filter(eligible_departments=department_id)
+        .order_by('id')
+        .prefetch_related(Prefetch('candidate_set', queryset=Candidate.objects.order_by('id')))
+    )
+    definition = {'categories': [], 'eligible': {}}
+    for category in categories:
+        candidates = [
+            {'id': candidate.id, 'name': candidate.name, 'photo': thumbnails.srcsets(candidate.photo)}
+            for candidate in category.candidate_set.all()
+        ]
+        definition['categories'].append({
+            'id': category.id,
+            'name': category.name,
+            'description': category.description,
+            'candidates': candidates,
+        })
+        definition['eligible'][category.id] = frozenset(candidate['id'] for candidate in candidates)
+    return definition
+
+
+def for_department(department_id):
+    """
+    Return the ballot for ``department_id`` as {'categories': [...], 'eligible':
+    {category_id: frozenset(candidate_ids)}}, building and caching it on a miss.
+    """
+    version = current_version()
+    key = f'ballot_definition:{department_id}'
+    definition = cache.get(key, version=version)
+    metrics.cache_lookup('ballot_definitions', definition is not None)
+    if definition is None:
+        definition = build(department_id)
+        cache.set(key, definition, timeout=None, version=version)
+    return definition
@@ -0,0 +1,119 @@
+# votingSystem/engine.py
+"""
+Parallel chain verification and recount. The chain is split into index ranges that
+worker processes verify or decrypt independently; the parent then stitches the
+ranges together by checking each range's first previous_hash against the hash the
+range before it ended on.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.db import connections
+from django.db.models import Max, Min
+from .chain import GENESIS_HASH, calculate_hash
+from .models import Block
+from .tally import count_blocks
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _init_worker():
+    django.setup()
+    # Forked workers must not reuse the parent's database connections
+    connections.close_all()
+
+
+def index_ranges(chunk_size=DEFAULT_CHUNK_SIZE):
+    bounds = Block.objects.aggregate(first=Min('index'), last=Max('index'))
+    if bounds['first'] is None:
+        return []
+    return [
+        (start, min(start + chunk_size - 1, bounds['last']))
+        for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+    ]
+
+
+def verify_range(bounds):
+    start, end = bounds
+    summary = {
+        'start': start,
+        'end': end,
+        'blocks': 0,
+        'first_index': None,
+        'first_previous_hash': None,
+        'last_index': None,
+        'last_hash': None,
+        'failures': [],
+    }
+    blocks = Block.objects.filter(index__gte=start, index__lte=end).order_by('index')
+    for block in blocks.iterator(chunk_size=2000):
+        errors = []
+        if calculate_hash(block.index, block.timestamp, block.vote_data, block.previous_hash) != block.hash:
+            errors.append('Hash mismatch')
+        if summary['blocks'] == 0:
+            summary['first_index'] = block.index
+            summary['first_previous_hash'] = block.previous_hash
+        elif block.previous_hash != summary['last_hash'] or block.index != summary['last_index'] + 1:
+            errors.append('Previous hash mismatch')
+        if errors:
+            summary['failures'].append((block.index, errors))
+        summary['blocks'] += 1
+        summary['last_index'] = block.index
+        summary['last_hash'] = block.hash
+    return summary
+
+
+def recount_range(bounds):
+    start, end = bounds
+    blocks = Block.objects.filter(index__gte=start, index__lte=end).order_by('index')
+    counts, _ = count_blocks(blocks.iterator(chunk_size=2000))
+    return counts
+
+
+def _map(func, ranges, workers):
+    if workers <= 1 or len(ranges) <= 1:
+        return [func(bounds) for bounds in ranges]
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(func, ranges))
+
+
+def verify_chain(workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Verify every block's hash and link. Returns a dict with the number of blocks
+    checked and a sorted list of (index, errors) failures.
+    """
+    summaries = _map(verify_range, index_ranges(chunk_size), workers)
+    # index -> errors, so a range's first block reports its own and the stitch's
+    # errors together, as a serial run would
+    failures = {}
+    previous = None
+    for summary in summaries:
+        for index, errors in summary['failures']:
+            failures.setdefault(index, []).extend(errors)
+        if not summary['blocks']:
+            continue
+        # Stitch this range onto the one before it (or onto the genesis hash)
+        if previous is None:
+            linked = summary['first_index'] == 1 and summary['first_previous_hash'] == GENESIS_HASH
+        else:
+            linked = (
+                summary['first_previous_hash'] == previous['last_hash']
+                and summary['first_index'] == previous['last_index'] + 1
+            )
+        if not linked:
+            failures.setdefault(summary['first_index'], []).append('Previous hash mismatch')
+        previous = summary
+    return {
+        'blocks': sum(summary['blocks'] for summary in summaries),
+        'failures': sorted(failures.items()),
+    }
+
+
+def recount(workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Decrypt every ballot on the chain and return (counts, last_index) like tally.count_blocks."""
+    ranges = index_ranges(chunk_size)
+    counts = Counter()
+    for range_counts in _map(recount_range, ranges, workers):
+        counts.update(range_counts)
+    return counts, ranges[-1][1] if ranges else 0
@@ -0,0 +1,139 @@
+# votingSystem/live.py
+"""
+Live results push. Each process runs one Broadcaster that polls the tally
+high-water mark and, when blocks have been appended, diffs the cached vote counts
+and fans the changed (category, candidate, count) entries out to every open
+results stream. A vote therefore costs each process one cache read and one
+fan-out, however many result screens are open.
+"""
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from . import results_cache
+from .models import TallyState
+
+# Events a subscriber may fall behind by before it is resynced with a snapshot
+SUBSCRIBER_BACKLOG = 100
+
+
+def _tally_version():
+    return TallyState.load().last_index
+
+
+def _entries(counts):
+    return [
+        {'category': category_id, 'candidate': candidate_id, 'count': count}
+        for category_id, candidates in sorted(counts.items())
+        for candidate_id, count in sorted(candidates.items())
+    ]
+
+
+def diff_counts(old, new):
+    """Return the entries of ``new`` whose count differs from ``old``."""
+    return [
+        entry for entry in _entries(new)
+        if old.get(entry['category'], {}).get(entry['candidate'], 0) != entry['count']
+    ]
+
+
+def format_event(event, version, data):
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG + 1)
+
+    def push(self, event):
+        if self.queue.qsize() < SUBSCRIBER_BACKLOG:
+            self.queue.put_nowait(event)
+            return
+        # Too far behind: drop the backlog and have the stream send a fresh snapshot
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(('resync', None, None))
+
+
+class Broadcaster:
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.subscribers = set()
+        self.version = None
+        self.counts = {}
+        self._task = None
+        self._lock = None
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._lock = asyncio.Lock()
+            self._task = loop.create_task(self._run())
+
+    def subscribe(self):
+        self._start()
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def snapshot(self):
+        self._start()
+        if self.version is None:
+            await self.poll()
+        return self.version, _entries(self.counts)
+
+    async def poll(self):
+        """Publish the changes since the last poll, if the tally has moved."""
+        async with self._lock:
+            tally_version = await sync_to_async(_tally_version)()
+            if tally_version == self.version:
+                return
+            entry = await sync_to_async(results_cache.get_entry)()
+            if entry['version'] == self.version:
+                # The shared entry is still being refreshed; try again next poll
+                return
+            changes = diff_counts(self.counts, entry['counts'])
+            self.version, self.counts = entry['version'], entry['counts']
+            if changes:
+                event = ('delta', self.version, changes)
+                for subscriber in self.subscribers:
+                    subscriber.push(event)
+
+    async def _run(self):
+        interval = self.interval or settings.RESULTS_PUSH_INTERVAL
+        while True:
+            await self.poll()
+            await asyncio.sleep(interval)
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(heartbeat=None):
+    """Yield one client's SSE stream: a snapshot, then deltas as they arrive."""
+    heartbeat = heartbeat or settings.RESULTS_PUSH_HEARTBEAT
+    version, entries = await broadcaster.snapshot()
+    # Nothing can be published between the snapshot and subscribing, so no delta is missed
+    subscriber = broadcaster.subscribe()
+    try:
+        yield format_event('snapshot', version, entries)
+        while True:
+            try:
+                event, version, changes = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if event == 'resync':
+                version, entries = await broadcaster.snapshot()
+                yield format_event('snapshot', version, entries)
+                continue
+            yield format_event(event, version, changes)
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,47 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand
+from votingSystem.ballots import decrypt_ballot, encrypt_ballot, get_cipher
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy JSON and the compact binary ballot formats: stored size, encrypt and decrypt time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=100_000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--candidates', type=int, default=5, help="Candidates per category.")
+
+    def handle(self, *args, **options):
+        cipher = get_cipher()
+        categories = options['categories']
+        candidates = options['candidates']
+        ballots = [
+            {
+                category_id: category_id * candidates + random.randrange(candidates)
+                for category_id in range(1, categories + 1)
+            }
+            for _ in range(options['ballots'])
+        ]
+
+        def legacy_encrypt(votes):
+            return cipher.encrypt(json.dumps(votes).encode()).decode()
+
+        self.stdout.write(f"{len(ballots)} ballots, {categories} categories each")
+        for name, encrypt in (('json', legacy_encrypt), ('binary', lambda votes: encrypt_ballot(votes, cipher))):
+            started = time.perf_counter()
+            tokens = [encrypt(votes) for votes in ballots]
+            encrypt_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for token in tokens:
+                decrypt_ballot(token, cipher)
+            decrypt_time = time.perf_counter() - started
+
+            stored = sum(len(token) for token in tokens)
+            self.stdout.write(
+                f"{name:>6}: {stored / len(tokens):.0f} bytes/ballot, {stored / 1e6:.1f}MB stored, "
+                f"encrypt {encrypt_time:.2f}s, decrypt+parse {decrypt_time:.2f}s "
+                f"({decrypt_time / len(tokens) * 1e6:.1f}us/ballot)"
+            )
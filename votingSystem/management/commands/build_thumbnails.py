@@ -0,0 +1,35 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from votingSystem import definitions, thumbnails
+from votingSystem.models import Candidate
+
+
+class Command(BaseCommand):
+    help = "Build the WebP/JPEG thumbnails of every candidate photo that is missing them (new uploads get theirs on save)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild thumbnails that already exist.")
+
+    def handle(self, *args, **options):
+        written = failed = 0
+        original_bytes = thumbnail_bytes = 0
+        for candidate in Candidate.objects.exclude(photo='').order_by('id'):
+            try:
+                written += thumbnails.generate(candidate.photo, force=options['force'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{candidate.photo.name}: {e}")
+                continue
+            original_bytes += candidate.photo.size
+            thumbnail_bytes += default_storage.size(
+                thumbnails.thumbnail_name(candidate.photo.name, thumbnails.SIZES[1], 'webp')
+            )
+        definitions.bump_version()
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnails{f', {failed} photos failed' if failed else ''}."))
+        if thumbnail_bytes:
+            self.stdout.write(
+                f"Ballot photos: {original_bytes / 1e6:.1f}MB as uploaded, "
+                f"{thumbnail_bytes / 1e3:.0f}kB as {thumbnails.SIZES[1]}px WebP "
+                f"({original_bytes / thumbnail_bytes:.0f}x smaller)."
+            )
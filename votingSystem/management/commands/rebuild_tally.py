@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from votingSystem import engine, results_cache, tally
+from votingSystem.models import VoteTally
+
+
+class Command(BaseCommand):
+    help = "Recount every ballot on the chain, report drift against the stored tally and rebuild it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report drift; leave the stored tally untouched.",
+        )
+        parser.add_argument('--workers', type=int, default=1, help="Processes to decrypt the chain with.")
+
+    def handle(self, *args, **options):
+        chain_counts, last_index = engine.recount(workers=options['workers'])
+        stored_counts = {
+            (row.category_id, row.candidate_id): row.count for row in VoteTally.objects.all()
+        }
+
+        drift = 0
+        for key in sorted(set(chain_counts) | set(stored_counts)):
+            chain_count = chain_counts.get(key, 0)
+            stored_count = stored_counts.get(key, 0)
+            if chain_count != stored_count:
+                drift += 1
+                category_id, candidate_id = key
+                self.stdout.write(
+                    f"Category {category_id}, candidate {candidate_id}: "
+                    f"tally {stored_count}, chain {chain_count}"
+                )
+
+        if drift:
+            self.stdout.write(self.style.WARNING(f"{drift} tally entr{'y' if drift == 1 else 'ies'} drifted from the chain."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Tally matches the chain."))
+
+        if options['check']:
+            return
+
+        tally.rebuild(chain_counts, last_index)
+        cache.delete(results_cache.CACHE_KEY)
+        self.stdout.write(self.style.SUCCESS(f"Tally rebuilt up to block {last_index}."))
@@ -0,0 +1,33 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from votingSystem import engine
+from votingSystem.models import Block, Category, Candidate
+
+
+class Command(BaseCommand):
+    help = "Decrypt and count every ballot on the chain, split across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--chunk-size', type=int, default=engine.DEFAULT_CHUNK_SIZE,
+            help="Blocks per work unit handed to a worker.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts, last_index = engine.recount(workers=options['workers'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        blocks = Block.objects.filter(index__lte=last_index).count()
+
+        categories = dict(Category.objects.values_list('id', 'name'))
+        candidates = dict(Candidate.objects.values_list('id', 'name'))
+        for (category_id, candidate_id), count in sorted(counts.items()):
+            self.stdout.write(
+                f"{categories.get(category_id, category_id)}: {candidates.get(candidate_id, candidate_id)} {count}"
+            )
+        self.stdout.write(
+            f"Recounted {blocks} blocks (up to block {last_index}) in {elapsed:.2f}s "
+            f"({blocks / elapsed if elapsed else 0:.0f} blocks/s, {options['workers']} workers)."
+        )
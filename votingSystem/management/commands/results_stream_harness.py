@@ -0,0 +1,109 @@
+import asyncio
+import statistics
+import time
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from account.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many concurrent results streams against core.asgi in this process and report "
+        "how fast each gets its snapshot and how widely each vote's delta is spread. Read-only: "
+        "cast votes from elsewhere while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to keep the streams open.")
+        parser.add_argument('--email', required=True, help="Staff user or voted student to stream as.")
+
+    def handle(self, *args, **options):
+        if not settings.RESULTS_PUSH_ENABLED:
+            raise CommandError("Live results push is off; set RESULTS_PUSH_ENABLED to run the harness.")
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}.")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        try:
+            asyncio.run(self._run(session.session_key, options['subscribers'], options['duration']))
+        finally:
+            session.delete()
+
+    async def _run(self, session_key, subscribers, duration):
+        from core.asgi import application
+
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        snapshots = []
+        deliveries = {}
+        statuses = []
+
+        async def subscribe():
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': '/results/stream/',
+                'raw_path': b'/results/stream/',
+                'query_string': b'',
+                'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'cookie', f'sessionid={session_key}'.encode())],
+                'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await stop.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                now = time.perf_counter()
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                    return
+                body = message.get('body', b'')
+                if b'event: snapshot' in body and len(snapshots) < subscribers:
+                    snapshots.append(now - started)
+                elif b'event: delta' in body:
+                    version = body.split(b'\n', 1)[0]
+                    deliveries.setdefault(version, []).append(now)
+
+            await application(scope, receive, send)
+
+        tasks = [asyncio.create_task(subscribe()) for _ in range(subscribers)]
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.wait(tasks, timeout=10)
+
+        failed = len(statuses) - statuses.count(200)
+        self.stdout.write(f"{statuses.count(200)} streams opened, {failed} refused.")
+        if failed and not statuses.count(200):
+            raise CommandError(f"Streams were refused with status {statuses[0]}; is the user allowed to see results?")
+        if snapshots:
+            snapshots.sort()
+            self.stdout.write(
+                f"Snapshot latency: p50 {statistics.median(snapshots) * 1000:.0f}ms, "
+                f"p99 {snapshots[int(len(snapshots) * 0.99) - 1] * 1000:.0f}ms"
+            )
+        for version, times in sorted(deliveries.items()):
+            self.stdout.write(
+                f"{version.decode()}: delivered to {len(times)} streams, "
+                f"spread {(max(times) - min(times)) * 1000:.1f}ms"
+            )
+        if not deliveries:
+            self.stdout.write("No votes were sealed while the streams were open.")
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from votingSystem import ballot_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Seal ballots from the write-ahead ballot queue (VOTE_QUEUE) into blocks, in the "
+        "order they were queued. Safe to restart at any time: it resumes from the last "
+        "sealed record."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Seal what is queued now, then exit.")
+        parser.add_argument('--interval', type=float, default=0.5, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--batch-size', type=int, help="Ballots per block; defaults to VOTE_QUEUE_BATCH.")
+
+    def handle(self, *args, **options):
+        while True:
+            sealed, skipped, quarantined = ballot_queue.seal_pending(options['batch_size'])
+            if sealed or skipped or quarantined:
+                self.stdout.write(
+                    f"Sealed {sealed} ballots, skipped {skipped} uncommitted records, "
+                    f"quarantined {quarantined} undecryptable ballots."
+                )
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
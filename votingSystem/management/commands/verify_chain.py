@@ -0,0 +1,30 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from votingSystem import engine
+
+
+class Command(BaseCommand):
+    help = "Re-hash and re-link every block on the chain, split across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--chunk-size', type=int, default=engine.DEFAULT_CHUNK_SIZE,
+            help="Blocks per work unit handed to a worker.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = engine.verify_chain(workers=options['workers'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        for index, errors in result['failures']:
+            self.stdout.write(f"Block {index}: {', '.join(errors)}")
+        self.stdout.write(
+            f"Verified {result['blocks']} blocks in {elapsed:.2f}s "
+            f"({result['blocks'] / elapsed if elapsed else 0:.0f} blocks/s, {options['workers']} workers)."
+        )
+        if result['failures']:
+            raise CommandError(f"Blockchain verification failed: first failure at block {result['failures'][0][0]}.")
+        self.stdout.write(self.style.SUCCESS("Blockchain verification successful: All blocks are valid."))
@@ -0,0 +1,123 @@
+# votingSystem/merkle.py
+"""
+Append-only Merkle tree over every ballot on the chain, in the shape of RFC 6962
+(Certificate Transparency). Leaf ``i`` is the ``i``-th ballot ever sealed. Only
+complete, aligned subtrees are stored (MerkleNode), so appending touches
+O(log n) nodes, and the root or an inclusion proof for any tree size can be
+rebuilt from O(log n) stored nodes fetched in a single query.
+"""
+import hashlib
+from django.db.models import Q
+from .models import MerkleNode
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def leaf_hash(encrypted_vote):
+    return hashlib.sha256(b'\x00' + encrypted_vote.encode()).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _peaks(start, size):
+    """Keys (level, position) of the complete subtrees covering leaves [start, start + size)."""
+    peaks = []
+    for level in range(size.bit_length() - 1, -1, -1):
+        if size & (1 << level):
+            peaks.append((level, start >> level))
+            start += 1 << level
+    return peaks
+
+
+def _fold(peaks, nodes):
+    # The RFC 6962 hash of a range is its peaks folded together from the right
+    result = nodes[peaks[-1]]
+    for key in reversed(peaks[:-1]):
+        result = node_hash(nodes[key], result)
+    return result
+
+
+def _fetch(keys, nodes=None):
+    nodes = dict(nodes or {})
+    missing = {key for key in keys if key not in nodes}
+    if missing:
+        query = Q()
+        for level, position in missing:
+            query |= Q(level=level, position=position)
+        for node in MerkleNode.objects.filter(query):
+            nodes[(node.level, node.position)] = node.hash
+    return nodes
+
+
+def root(tree_size):
+    if not tree_size:
+        return EMPTY_ROOT
+    peaks = _peaks(0, tree_size)
+    return _fold(peaks, _fetch(peaks))
+
+
+def append_leaves(tree_size, leaf_hashes):
+    """
+    Add ``leaf_hashes`` to a tree currently holding ``tree_size`` leaves, storing the
+    new leaves and every subtree they complete. Returns the new root.
+    """
+    # Every left sibling outside this batch is a peak of the current tree
+    nodes = _fetch(_peaks(0, tree_size))
+    new_nodes = {}
+    for offset, value in enumerate(leaf_hashes):
+        level, position = 0, tree_size + offset
+        new_nodes[(level, position)] = value
+        while position & 1:
+            sibling = nodes.get((level, position - 1)) or new_nodes[(level, position - 1)]
+            value = node_hash(sibling, value)
+            level, position = level + 1, position >> 1
+            new_nodes[(level, position)] = value
+    MerkleNode.objects.bulk_create(
+        MerkleNode(level=level, position=position, hash=value)
+        for (level, position), value in new_nodes.items()
+    )
+    nodes.update(new_nodes)
+    return _fold(_peaks(0, tree_size + len(leaf_hashes)), nodes)
+
+
+def _path(leaf_index, start, size):
+    # RFC 6962 section 2.1.1: the ranges whose hashes form the audit path, leaf first
+    if size == 1:
+        return []
+    split = 1 << ((size - 1).bit_length() - 1)
+    if leaf_index < start + split:
+        return _path(leaf_index, start, split) + [(start + split, size - split)]
+    return _path(leaf_index, start + split, size - split) + [(start, split)]
+
+
+def inclusion_proof(leaf_index, tree_size):
+    """Return the audit path proving leaf ``leaf_index`` is in the tree of ``tree_size`` leaves."""
+    ranges = [_peaks(start, size) for start, size in _path(leaf_index, 0, tree_size)]
+    nodes = _fetch({key for peaks in ranges for key in peaks})
+    return [_fold(peaks, nodes) for peaks in ranges]
+
+
+def verify_inclusion(leaf, leaf_index, tree_size, proof, expected_root):
+    """
+    Check an audit path against a published root (RFC 9162 section 2.1.3.2). Needs no
+    database access, so a voter can run it independently on their receipt.
+    """
+    if leaf_index >= tree_size:
+        return False
+    fn, sn = leaf_index, tree_size - 1
+    result = leaf
+    for sibling in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            result = node_hash(sibling, result)
+            while not (fn & 1 or fn == 0):
+                fn >>= 1
+                sn >>= 1
+        else:
+            result = node_hash(result, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and result == expected_root
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TallyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_index', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_id', models.IntegerField()),
+                ('candidate_id', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('category_id', 'candidate_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_chain_tip(apps, schema_editor):
+    Block = apps.get_model('votingSystem', 'Block')
+    ChainTip = apps.get_model('votingSystem', 'ChainTip')
+    last_block = Block.objects.order_by('-index').first()
+    ChainTip.objects.create(
+        pk=1,
+        index=last_block.index if last_block else 0,
+        hash=last_block.hash if last_block else '0' * 64,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0002_vote_tally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainTip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField(default=0)),
+                ('hash', models.CharField(max_length=256)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='block',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(seed_chain_tip, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:22
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def build_merkle_tree(apps, schema_editor):
+    Block = apps.get_model('votingSystem', 'Block')
+    ChainTip = apps.get_model('votingSystem', 'ChainTip')
+    MerkleNode = apps.get_model('votingSystem', 'MerkleNode')
+
+    def node_hash(left, right):
+        return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+    tree_size = 0
+    peaks = []  # (level, hash) of the complete subtrees so far, largest first
+    nodes, blocks = [], []
+    for block in Block.objects.order_by('index').iterator():
+        block.ballot_offset = tree_size
+        blocks.append(block)
+        ballots = json.loads(block.vote_data) if block.vote_data.startswith('[') else [block.vote_data]
+        for ballot in ballots:
+            level, position = 0, tree_size
+            value = hashlib.sha256(b'\x00' + ballot.encode()).hexdigest()
+            nodes.append(MerkleNode(level=level, position=position, hash=value))
+            while peaks and peaks[-1][0] == level:
+                value = node_hash(peaks.pop()[1], value)
+                level, position = level + 1, position >> 1
+                nodes.append(MerkleNode(level=level, position=position, hash=value))
+            peaks.append((level, value))
+            tree_size += 1
+        if len(nodes) >= 1000:
+            MerkleNode.objects.bulk_create(nodes)
+            Block.objects.bulk_update(blocks, ['ballot_offset'])
+            nodes, blocks = [], []
+    MerkleNode.objects.bulk_create(nodes)
+    Block.objects.bulk_update(blocks, ['ballot_offset'])
+
+    root = hashlib.sha256(b'').hexdigest()
+    if peaks:
+        root = peaks[-1][1]
+        for _, value in reversed(peaks[:-1]):
+            root = node_hash(value, root)
+    ChainTip.objects.filter(pk=1).update(ballots=tree_size, merkle_root=root)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0003_chain_tip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='block',
+            name='ballot_offset',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chaintip',
+            name='ballots',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chaintip',
+            name='merkle_root',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='MerkleNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('position', models.BigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+            ],
+            options={
+                'unique_together': {('level', 'position')},
+            },
+        ),
+        migrations.RunPython(build_merkle_tree, migrations.RunPython.noop),
+    ]
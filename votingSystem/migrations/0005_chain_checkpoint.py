@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0004_merkle_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('hash', models.CharField(max_length=256)),
+                ('full_audit', models.BooleanField(default=False)),
+                ('verified_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_indexes(apps, schema_editor):
+    # Chains written before appends were sequenced can contain forked indexes;
+    # renumbering them would invalidate their hashes, so stop and report instead.
+    Block = apps.get_model('votingSystem', 'Block')
+    duplicates = list(
+        Block.objects.values('index').annotate(n=Count('id')).filter(n__gt=1).values_list('index', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Blocks share an index ({', '.join(map(str, duplicates[:10]))}); "
+            "resolve the forked chain before making Block.index unique."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0005_chain_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_indexes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='block',
+            name='ballot_offset',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='block',
+            name='hash',
+            field=models.CharField(db_index=True, max_length=256),
+        ),
+        migrations.AlterField(
+            model_name='block',
+            name='index',
+            field=models.IntegerField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='merklenode',
+            index=models.Index(fields=['hash', 'level'], name='votingSyste_hash_7d2613_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0006_block_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='block',
+            name='previous_hash',
+            field=models.CharField(db_index=True, max_length=256),
+        ),
+    ]
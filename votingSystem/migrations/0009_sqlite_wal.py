@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # WAL lets readers carry on while a ballot is being appended. The journal mode
+    # is stored in the database file, so it is set once here rather than on every
+    # connection (which would rewrite the file header on each manage.py command).
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+def disable_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    # SQLite cannot change the journal mode inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('votingSystem', '0008_ballot_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, disable_wal),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingSystem', '0009_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedballot',
+            name='ballot',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='queuedballot',
+            name='error',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='queuedballot',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
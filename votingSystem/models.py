@@ -4,17 +4,60 @@ from django.utils import timezone
 from account.models import Student
 
 class Block(models.Model):
-    index = models.IntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    index = models.IntegerField(unique=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     vote_data = models.TextField()  # Encrypted or hashed vote
-    previous_hash = models.CharField(max_length=256)
-    hash = models.CharField(max_length=256)
+    previous_hash = models.CharField(max_length=256, db_index=True)
+    hash = models.CharField(max_length=256, db_index=True)
     nonce = models.IntegerField(default=0)
+    # Merkle leaf index of the block's first ballot; see votingSystem.merkle
+    ballot_offset = models.IntegerField(default=0, db_index=True)
 
     def __str__(self):
         return f"{self.index}"
 
 
+class ChainTip(models.Model):
+    # Single row holding the index and hash of the newest block. Appends lock this
+    # row to sequence the chain; see votingSystem.chain.append_block.
+    index = models.IntegerField(default=0)
+    hash = models.CharField(max_length=256)
+    ballots = models.IntegerField(default=0)
+    merkle_root = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return f"{self.index}"
+
+
+class ChainCheckpoint(models.Model):
+    # A block the admin verification has walked up to and found valid; later runs
+    # only re-hash blocks appended after the newest checkpoint
+    index = models.IntegerField()
+    hash = models.CharField(max_length=256)
+    full_audit = models.BooleanField(default=False)
+    verified_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.index}"
+
+
+class MerkleNode(models.Model):
+    # Complete subtree covering ballots [position * 2**level, (position + 1) * 2**level)
+    level = models.PositiveSmallIntegerField()
+    position = models.BigIntegerField()
+    hash = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('level', 'position')
+        indexes = [
+            # At level 0 the hash is the digest of one ballot's ciphertext; receipts are looked up by it
+            models.Index(fields=['hash', 'level']),
+        ]
+
+    def __str__(self):
+        return f"{self.level}/{self.position}"
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -38,3 +81,58 @@ class Candidate(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.category}"
+
+
+class VoteTally(models.Model):
+    # Plain ids rather than foreign keys: the tally mirrors what the ballots say,
+    # even if a category or candidate is later removed.
+    category_id = models.IntegerField()
+    candidate_id = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category_id', 'candidate_id')
+
+    def __str__(self):
+        return f"{self.category_id}/{self.candidate_id}: {self.count}"
+
+
+class TallyState(models.Model):
+    # Single row: index of the last block whose ballots are included in VoteTally.
+    last_index = models.IntegerField(default=0)
+
+    @classmethod
+    def load(cls):
+        state, _ = cls.objects.get_or_create(pk=1)
+        return state
+
+    def __str__(self):
+        return f"Tallied up to block {self.last_index}"
+
+
+class QueuedBallot(models.Model):
+    # Commit marker for a ballot in the write-ahead log (VOTE_QUEUE). It is created
+    # in the same transaction that flips the voter's has_voted, and deliberately
+    # holds no link back to the voter. Deleted when the ballot is sealed; a ballot
+    # that cannot be decrypted is quarantined instead, keeping its ciphertext here.
+    ballot_id = models.CharField(max_length=32, unique=True)
+    queued_at = models.DateTimeField(default=timezone.now)
+    ballot = models.TextField(blank=True)
+    error = models.CharField(max_length=200, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.ballot_id
+
+
+class BallotQueueState(models.Model):
+    # Single row: byte offset in the ballot log up to which every record is sealed or abandoned.
+    offset = models.BigIntegerField(default=0)
+
+    @classmethod
+    def load(cls):
+        state, _ = cls.objects.get_or_create(pk=1)
+        return state
+
+    def __str__(self):
+        return f"Sealed up to byte {self.offset}"
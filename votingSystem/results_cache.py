@@ -0,0 +1,181 @@
+# votingSystem/results_cache.py
+"""
+Shared, stampede-protected cache of the vote counts shown on the results page.
+
+The cached entry records the tally high-water mark (TallyState.last_index) it was
+built at. A newer high-water mark means the entry is stale: one request takes the
+rebuild lock and refreshes it in a background thread while every request,
+including that one, keeps serving the stale counts. Only a cold cache makes a
+request wait, and then only one of them rebuilds.
+
+Requests compare the entry against the high-water mark published in the cache
+when the transaction that advanced it commits, rather than querying TallyState
+each time. The published value expires after VERSION_TIMEOUT seconds, so a lost
+or out-of-order publish is corrected from the database soon after.
+
+The results page and /results.json render from a document derived from the
+cached counts and keyed by their high-water mark and the ballot definitions
+version, which doubles as the ETag.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from django.core.cache import cache
+from django.db import connection, transaction
+from core import metrics
+from . import definitions, tally
+from .models import Candidate, TallyState
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'vote_counts'
+VERSION_KEY = 'vote_counts:tally_version'
+LOCK_KEY = 'vote_counts:rebuild'
+LOCK_TIMEOUT = 60
+VERSION_TIMEOUT = 2
+COLD_WAIT = 5
+DOCUMENT_TIMEOUT = 24 * 60 * 60
+METRICS = ('hits', 'stale', 'misses', 'rebuilds', 'errors')
+
+# Kept in memory: counting in the shared cache would add a read-modify-write of a
+# cache file to every request, and lose increments between processes
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _count(metric):
+    with _counts_lock:
+        _counts[metric] += 1
+
+
+def stats():
+    """Return this process's hit/stale/miss/rebuild/error counters."""
+    with _counts_lock:
+        return {metric: _counts[metric] for metric in METRICS}
+
+
+def publish_version(last_index):
+    """Publish a new tally high-water mark once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, last_index, timeout=VERSION_TIMEOUT))
+
+
+def _tally_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = TallyState.load().last_index
+        cache.set(VERSION_KEY, version, timeout=VERSION_TIMEOUT)
+    return version
+
+
+def _build():
+    tally.sync()
+    # Read the high-water mark before the counts, so a block landing in between
+    # leaves the entry looking stale rather than fresh
+    version = TallyState.load().last_index
+    return {'version': version, 'counts': tally.vote_counts(), 'built_at': time.time()}
+
+
+def _rebuild():
+    entry = _build()
+    cache.set(CACHE_KEY, entry, timeout=None)
+    _count('rebuilds')
+    return entry
+
+
+def _rebuild_and_release():
+    try:
+        _rebuild()
+    except Exception:
+        _count('errors')
+        logger.exception("Rebuilding the cached vote counts failed")
+    finally:
+        cache.delete(LOCK_KEY)
+        connection.close()
+
+
+def refresh():
+    """Start a background rebuild unless another process or thread is already running one."""
+    if not cache.add(LOCK_KEY, True, timeout=LOCK_TIMEOUT):
+        return False
+    threading.Thread(target=_rebuild_and_release, daemon=True).start()
+    return True
+
+
+def get_entry():
+    """
+    Return the cached {'version', 'counts', 'built_at'} entry, where counts is
+    {category_id: {candidate_id: count}} as of tally high-water mark version. The
+    entry may be slightly stale.
+    """
+    entry = cache.get(CACHE_KEY)
+    if entry is not None:
+        if entry['version'] >= _tally_version():
+            _count('hits')
+        else:
+            _count('stale')
+            refresh()
+        return entry
+
+    _count('misses')
+    if cache.add(LOCK_KEY, True, timeout=LOCK_TIMEOUT):
+        try:
+            return _rebuild()
+        finally:
+            cache.delete(LOCK_KEY)
+
+    # Someone else is building the first entry; wait for it rather than piling on
+    deadline = time.monotonic() + COLD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(CACHE_KEY)
+        if entry is not None:
+            return entry
+    return _build()
+
+
+def get_vote_counts():
+    """Return {category_id: {candidate_id: count}}, possibly slightly stale."""
+    return get_entry()['counts']
+
+
+def _build_document(entry):
+    document = {'version': entry['version'], 'built_at': entry['built_at'], 'categories': []}
+    category = None
+    # One query for every candidate and its category, in display order
+    for candidate in Candidate.objects.select_related('category').order_by('category_id', 'id'):
+        if category is None or category['id'] != candidate.category_id:
+            counts = entry['counts'].get(candidate.category_id, {})
+            category = {
+                'id': candidate.category_id,
+                'name': candidate.category.name,
+                'total': sum(counts.values()),
+                'candidates': [],
+            }
+            document['categories'].append(category)
+        votes = counts.get(candidate.id, 0)
+        category['candidates'].append({
+            'id': candidate.id,
+            'name': candidate.name,
+            'photo': candidate.photo.url if candidate.photo else '',
+            'votes': votes,
+            'percentage': (votes / category['total'] * 100) if category['total'] > 0 else 0,
+        })
+    return document
+
+
+def get_document():
+    """
+    Return the results document (categories with their candidates, votes and
+    percentages) and its ETag. The document is built once per tally high-water
+    mark and ballot definitions version and shared by every process.
+    """
+    entry = get_entry()
+    etag = f'"{entry["version"]}-{definitions.current_version()}"'
+    key = f'results_document:{etag}'
+    document = cache.get(key)
+    metrics.cache_lookup('results_document', document is not None)
+    if document is None:
+        document = _build_document(entry)
+        cache.set(key, document, timeout=DOCUMENT_TIMEOUT)
+    return document, etag
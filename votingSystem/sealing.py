@@ -0,0 +1,125 @@
+# votingSystem/sealing.py
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from account import turnout
+from account.models import Student
+from . import chain, tally
+from .ballots import AlreadyVoted, pack_ballots
+
+
+class PendingBallot:
+    def __init__(self, student_id, votes, encrypted_vote):
+        self.student_id = student_id
+        self.votes = votes
+        self.encrypted_vote = encrypted_vote
+        self.block = None
+        self.position = None
+        self.error = None
+        self.done = False
+
+
+def seal_ballots(batch):
+    """
+    Put a batch of ballots on the chain as one block, in one transaction. Each
+    ballot's voter is marked as having voted in that same transaction; ballots from
+    voters who already voted get an AlreadyVoted error and are left out of the block.
+    """
+    accepted = []
+    try:
+        with transaction.atomic():
+            for ballot in batch:
+                if Student.objects.filter(pk=ballot.student_id, has_voted=False).update(has_voted=True):
+                    accepted.append(ballot)
+                else:
+                    ballot.error = AlreadyVoted()
+            if accepted:
+                turnout.record_votes([ballot.student_id for ballot in accepted])
+                block = chain.append_block(
+                    pack_ballots([ballot.encrypted_vote for ballot in accepted]),
+                    on_append=lambda block: tally.record_block(block, [ballot.votes for ballot in accepted]),
+                )
+                for position, ballot in enumerate(accepted):
+                    ballot.block = block
+                    ballot.position = position
+    except Exception as e:
+        # Everything was rolled back; only the AlreadyVoted verdicts still hold
+        for ballot in batch:
+            if ballot.error is None:
+                ballot.error = e
+            ballot.block = ballot.position = None
+    for ballot in batch:
+        ballot.done = True
+
+
+class GroupCommitter:
+    """
+    Collects ballots submitted by concurrent requests in this process and seals them
+    together. The first waiting request becomes the leader: it waits up to
+    ``window`` seconds (or until ``max_ballots`` are queued) and seals the batch,
+    while the others block until their ballot has been sealed.
+    """
+
+    def __init__(self, max_ballots, window):
+        self.max_ballots = max_ballots
+        self.window = window
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sealing = False
+
+    def submit(self, ballot):
+        with self._cond:
+            self._queue.append(ballot)
+            self._cond.notify_all()
+            while not ballot.done:
+                if self._sealing:
+                    self._cond.wait()
+                    continue
+                self._sealing = True
+                batch = self._collect()
+                self._cond.release()
+                try:
+                    seal_ballots(batch)
+                finally:
+                    self._cond.acquire()
+                    self._sealing = False
+                    self._cond.notify_all()
+
+    def _collect(self):
+        deadline = time.monotonic() + self.window
+        while len(self._queue) < self.max_ballots:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        batch = self._queue[:self.max_ballots]
+        del self._queue[:self.max_ballots]
+        return batch
+
+
+_committer = None
+_committer_lock = threading.Lock()
+
+
+def get_committer():
+    global _committer
+    with _committer_lock:
+        if _committer is None:
+            _committer = GroupCommitter(
+                max_ballots=settings.VOTE_GROUP_COMMIT_MAX_BALLOTS,
+                window=settings.VOTE_GROUP_COMMIT_WINDOW,
+            )
+        return _committer
+
+
+def submit_ballot(student_id, votes, encrypted_vote):
+    """Seal a voter's ballot, batched with others when group commit is enabled."""
+    ballot = PendingBallot(student_id, votes, encrypted_vote)
+    if settings.VOTE_GROUP_COMMIT:
+        get_committer().submit(ballot)
+    else:
+        seal_ballots([ballot])
+    if ballot.error:
+        raise ballot.error
+    return ballot
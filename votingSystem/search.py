@@ -0,0 +1,115 @@
+# votingSystem/search.py
+"""
+In-memory candidate name index for the results search. Names are normalised
+(case, accents and punctuation folded) and split into tokens; a query matches a
+candidate when every query token matches one of the name's tokens by prefix,
+substring, or, for typos, trigram similarity. The index is built once per
+process per ballot definitions version, which the signals bump whenever a
+Candidate or Category is saved or deleted.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from . import definitions
+from .models import Candidate
+
+# Share of trigrams two tokens must have in common (Dice coefficient) to count as a typo match
+FUZZY_THRESHOLD = 0.5
+PREFIX_SCORE = 1.0
+SUBSTRING_SCORE = 0.8
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CandidateIndex:
+    def __init__(self, candidates):
+        # candidates: (candidate_id, category_id, name, category_name) tuples
+        self.candidates = list(candidates)
+        self.postings = {}
+        for position, (_, _, name, _) in enumerate(self.candidates):
+            for token in normalize(name).split():
+                self.postings.setdefault(token, set()).add(position)
+        self.tokens = sorted(self.postings)
+        self.token_trigrams = {token: trigrams(token) for token in self.tokens}
+        self.by_trigram = {}
+        for token, grams in self.token_trigrams.items():
+            for gram in grams:
+                self.by_trigram.setdefault(gram, set()).add(token)
+
+    def _token_scores(self, query_token):
+        """Score every indexed token that ``query_token`` matches."""
+        scores = {}
+        start = bisect.bisect_left(self.tokens, query_token)
+        for token in self.tokens[start:]:
+            if not token.startswith(query_token):
+                break
+            scores[token] = PREFIX_SCORE
+        if len(query_token) < 3:
+            return scores
+        query_grams = trigrams(query_token)
+        sharing = set().union(*(self.by_trigram.get(gram, ()) for gram in query_grams))
+        for token in sharing - scores.keys():
+            if query_token in token:
+                scores[token] = SUBSTRING_SCORE
+                continue
+            grams = self.token_trigrams[token]
+            similarity = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            if similarity >= FUZZY_THRESHOLD:
+                scores[token] = similarity * SUBSTRING_SCORE
+        return scores
+
+    def search(self, query, limit=50):
+        """Return up to ``limit`` (candidate_id, category_id, name, category_name) tuples, best match first."""
+        query_tokens = normalize(query).split()
+        if not query_tokens:
+            return []
+        totals = None
+        for query_token in query_tokens:
+            best = {}
+            for token, score in self._token_scores(query_token).items():
+                for position in self.postings[token]:
+                    best[position] = max(best.get(position, 0), score)
+            if totals is None:
+                totals = best
+            else:
+                totals = {position: totals[position] + score for position, score in best.items() if position in totals}
+            if not totals:
+                return []
+        ranked = sorted(totals, key=lambda position: (-totals[position], self.candidates[position][2]))
+        return [self.candidates[position] for position in ranked[:limit]]
+
+
+_lock = threading.Lock()
+_index = (None, None)
+
+
+def get_index():
+    """Return this process's index, rebuilding it after any ballot definitions change."""
+    global _index
+    version = definitions.current_version()
+    built_for, index = _index
+    if built_for != version:
+        with _lock:
+            built_for, index = _index
+            if built_for != version:
+                index = CandidateIndex(
+                    Candidate.objects.order_by('id').values_list('id', 'category_id', 'name', 'category__name')
+                )
+                _index = (version, index)
+    return index
+
+
+def search(query, limit=50):
+    return get_index().search(query, limit)
@@ -0,0 +1,30 @@
+# votingSystem/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from account.models import Department
+from .models import Category, Candidate, TallyState
+from . import definitions, results_cache, thumbnails
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(m2m_changed, sender=Category.eligible_departments.through)
+def invalidate_ballot_definitions(sender, **kwargs):
+    definitions.bump_version()
+
+
+@receiver(post_save, sender=Candidate)
+def build_candidate_thumbnails(sender, instance, **kwargs):
+    if instance.photo:
+        thumbnails.generate_safely(instance.photo)
+        # Rebuild definitions built while the thumbnails were still missing
+        definitions.bump_version()
+
+
+@receiver(post_save, sender=TallyState)
+def publish_tally_version(sender, instance, **kwargs):
+    results_cache.publish_version(instance.last_index)
@@ -0,0 +1,185 @@
+# votingSystem/tally.py
+import logging
+from array import array
+from collections import Counter
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from .ballots import BALLOT_FORMAT, decode_ballot_pairs, get_cipher, unpack_ballots
+from .models import Block, VoteTally, TallyState
+
+logger = logging.getLogger(__name__)
+
+# Ballots decoded into one integer array before it is aggregated
+BATCH_BALLOTS = 50_000
+BALLOT_HEADER = bytes([BALLOT_FORMAT])
+
+
+def count_ballots(ballots, counts=None):
+    """Add a sequence of decrypted ballots to a Counter keyed by (category_id, candidate_id)."""
+    counts = Counter() if counts is None else counts
+    for votes in ballots:
+        for category_id, candidate_id in votes.items():
+            counts[(category_id, candidate_id)] += 1
+    return counts
+
+
+def tally_matrix(pairs):
+    """
+    Aggregate an (n, 2) integer array of (category_id, candidate_id) rows into a
+    dense category x candidate matrix. Returns (category_ids, candidate_ids, matrix)
+    where matrix[i, j] counts the votes for candidate_ids[j] in category_ids[i].
+    """
+    category_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    candidate_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = np.bincount(
+        rows * len(candidate_ids) + columns, minlength=len(category_ids) * len(candidate_ids)
+    ).reshape(len(category_ids), len(candidate_ids))
+    return category_ids, candidate_ids, matrix
+
+
+def varint_pairs(payloads):
+    """
+    Decode binary ballot payloads (plaintext without its version byte) into an
+    (n, 2) array of (category_id, candidate_id) rows in one vectorized pass.
+    Returns None if any payload is not a whole number of varint pairs.
+    """
+    if not payloads:
+        return np.empty((0, 2), dtype=np.int64)
+    data = np.frombuffer(b''.join(payloads), dtype=np.uint8)
+    lengths = np.fromiter(map(len, payloads), dtype=np.int64, count=len(payloads))
+    starts = np.cumsum(lengths) - lengths
+    terminal = (data & 0x80) == 0
+    if not terminal[starts + lengths - 1].all() or (np.add.reduceat(terminal.astype(np.int64), starts) % 2).any():
+        return None
+    value_ends = np.flatnonzero(terminal)
+    value_starts = np.concatenate(([0], value_ends[:-1] + 1))
+    shifts = 7 * (np.arange(len(data)) - np.repeat(value_starts, value_ends - value_starts + 1))
+    values = np.add.reduceat((data & 0x7f).astype(np.int64) << shifts, value_starts)
+    return values.reshape(-1, 2)
+
+
+def _count_batch(payloads, legacy_values, counts):
+    pairs = varint_pairs(payloads)
+    if pairs is None:
+        # Fall back to decoding one at a time to find and skip the bad ballots
+        pairs = np.empty((0, 2), dtype=np.int64)
+        for payload in payloads:
+            try:
+                legacy_values.extend(decode_ballot_pairs(BALLOT_HEADER + payload))
+            except ValueError as e:
+                logger.warning("Malformed ballot: %s", e)
+    pairs = np.concatenate([pairs, np.frombuffer(legacy_values, dtype=np.int64).reshape(-1, 2)])
+    if not len(pairs):
+        return
+    category_ids, candidate_ids, matrix = tally_matrix(pairs)
+    for row, column in zip(*np.nonzero(matrix)):
+        counts[(int(category_ids[row]), int(candidate_ids[column]))] += int(matrix[row, column])
+
+
+def count_blocks(blocks, cipher=None):
+    """
+    Decrypt and count the ballots in ``blocks``. Undecryptable ballots are logged and
+    skipped. Decrypted ballots are decoded and aggregated in vectorized batches, so
+    the Python work per ballot is little more than its decryption.
+    """
+    cipher = cipher or get_cipher()
+    counts = Counter()
+    last_index = 0
+    payloads = []
+    legacy_values = array('q')
+    batched = 0
+    for block in blocks:
+        last_index = max(last_index, block.index)
+        try:
+            encrypted_votes = unpack_ballots(block.vote_data)
+        except ValueError as e:
+            logger.warning("Malformed ballot list in block %s: %s", block.index, e)
+            continue
+        for encrypted_vote in encrypted_votes:
+            try:
+                plaintext = cipher.decrypt(encrypted_vote.encode())
+                if plaintext[:1] == BALLOT_HEADER:
+                    # A ballot that skipped every category has no pairs at all
+                    if len(plaintext) > 1:
+                        payloads.append(plaintext[1:])
+                else:
+                    legacy_values.extend(decode_ballot_pairs(plaintext))
+            except Exception as e:
+                logger.warning("Decryption error for block %s: %s", block.index, e)
+                continue
+            batched += 1
+            if batched == BATCH_BALLOTS:
+                _count_batch(payloads, legacy_values, counts)
+                payloads, legacy_values, batched = [], array('q'), 0
+    _count_batch(payloads, legacy_values, counts)
+    return counts, last_index
+
+
+def _apply(counts):
+    for (category_id, candidate_id), n in counts.items():
+        updated = VoteTally.objects.filter(
+            category_id=category_id, candidate_id=candidate_id
+        ).update(count=F('count') + n)
+        if not updated:
+            VoteTally.objects.create(category_id=category_id, candidate_id=candidate_id, count=n)
+
+
+def _locked_state():
+    TallyState.load()
+    return TallyState.objects.select_for_update().get(pk=1)
+
+
+def _catch_up(state):
+    blocks = Block.objects.filter(index__gt=state.last_index).order_by('index')
+    counts, last_index = count_blocks(blocks.iterator())
+    if last_index:
+        _apply(counts)
+        state.last_index = last_index
+        state.save(update_fields=['last_index'])
+
+
+def sync():
+    """Fold any blocks appended since the high-water mark into the tally."""
+    if not Block.objects.filter(index__gt=TallyState.load().last_index).exists():
+        return
+    with transaction.atomic():
+        _catch_up(_locked_state())
+
+
+def record_block(block, ballots):
+    """
+    Add a freshly appended block to the tally using its already-known plaintext
+    ballots, so the common path needs no decryption at all.
+    """
+    with transaction.atomic():
+        state = _locked_state()
+        if state.last_index != block.index - 1:
+            # The tally is behind this block; read the missing blocks from the chain.
+            _catch_up(state)
+            return
+        _apply(count_ballots(ballots))
+        state.last_index = block.index
+        state.save(update_fields=['last_index'])
+
+
+def vote_counts():
+    """Return the tally as {category_id: {candidate_id: count}}, bringing it up to date first."""
+    sync()
+    counts = {}
+    for category_id, candidate_id, count in VoteTally.objects.values_list('category_id', 'candidate_id', 'count'):
+        counts.setdefault(category_id, {})[candidate_id] = count
+    return counts
+
+
+def rebuild(counts, last_index):
+    """Replace the stored tally with ``counts`` computed from the chain up to ``last_index``."""
+    with transaction.atomic():
+        state = _locked_state()
+        VoteTally.objects.all().delete()
+        VoteTally.objects.bulk_create(
+            VoteTally(category_id=category_id, candidate_id=candidate_id, count=n)
+            for (category_id, candidate_id), n in counts.items()
+        )
+        state.last_index = last_index
+        state.save(update_fields=['last_index'])
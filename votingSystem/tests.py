@@ -1,3 +1,794 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from collections import Counter
+from types import SimpleNamespace
+import threading
+from asgiref.sync import sync_to_async
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from account.models import Department, Student, TurnoutCounter, User
+from core import metrics as core_metrics
+from . import assets, ballot_queue, chain, definitions, engine, live, merkle, results_cache, search, tally, thumbnails
+from .ballots import decrypt_ballot, encode_ballot, encrypt_ballot, get_cipher, pack_ballots, unpack_ballots
+from .chain import GENESIS_HASH, calculate_hash
+from .models import Block, Category, Candidate, ChainCheckpoint, ChainTip, QueuedBallot, TallyState, VoteTally
 
-# Create your tests here.
+# Keep test runs out of the cache directory the development server uses
+test_cache = override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='votingSystem-test-cache-'),
+    }
+})
+
+
+def create_student(index_number, department):
+    user = User.objects.create(email=f"{index_number}@students.edu")
+    return Student.objects.create(
+        user=user,
+        index_number=index_number,
+        first_name='Test',
+        last_name=index_number,
+        year_group='2025',
+        department=department,
+    )
+
+
+@test_cache
+class ConcurrentVoteTests(TransactionTestCase):
+    voters = 50
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Computer Science')
+        self.category = Category.objects.create(name='President')
+        self.category.eligible_departments.add(self.department)
+        self.candidate = Candidate.objects.create(
+            category=self.category, name='Candidate', photo='candidates/candidate.jpg'
+        )
+
+    def _vote_in_parallel(self, students):
+        barrier = threading.Barrier(len(students))
+        errors = []
+
+        def cast(student):
+            client = Client()
+            client.force_login(student.user)
+            try:
+                barrier.wait()
+                client.post(reverse('vote'), {f'category-{self.category.id}': self.candidate.id})
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cast, args=(student,)) for student in students]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assertLinearChain(self, length):
+        blocks = list(Block.objects.order_by('index'))
+        self.assertEqual([block.index for block in blocks], list(range(1, length + 1)))
+        previous_hash = GENESIS_HASH
+        leaves = []
+        for block in blocks:
+            self.assertEqual(block.previous_hash, previous_hash)
+            self.assertEqual(
+                block.hash,
+                calculate_hash(block.index, block.timestamp, block.vote_data, block.previous_hash),
+            )
+            self.assertEqual(block.ballot_offset, len(leaves))
+            leaves += [merkle.leaf_hash(ballot) for ballot in unpack_ballots(block.vote_data)]
+            previous_hash = block.hash
+        self.assertEqual(ChainTip.objects.get(pk=1).merkle_root, reference_root(leaves))
+
+    def test_parallel_voters_produce_linear_chain(self):
+        students = [create_student(f'CS{n:04d}', self.department) for n in range(self.voters)]
+        self._vote_in_parallel(students)
+
+        self.assertLinearChain(self.voters)
+        self.assertFalse(Student.objects.filter(has_voted=False).exists())
+        self.assertEqual(TurnoutCounter.objects.get().voted, self.voters)
+        tally = VoteTally.objects.get(category_id=self.category.id, candidate_id=self.candidate.id)
+        self.assertEqual(tally.count, self.voters)
+
+    def test_parallel_resubmission_records_one_ballot(self):
+        student = create_student('CS9999', self.department)
+        self._vote_in_parallel([student] * 8)
+
+        self.assertLinearChain(1)
+
+    @override_settings(VOTE_GROUP_COMMIT=True)
+    def test_group_commit_batches_parallel_voters(self):
+        students = [create_student(f'CS{n:04d}', self.department) for n in range(self.voters)]
+        self._vote_in_parallel(students)
+
+        blocks = Block.objects.order_by('index')
+        self.assertLinearChain(blocks.count())
+        self.assertLess(blocks.count(), self.voters)
+        self.assertEqual(sum(len(unpack_ballots(block.vote_data)) for block in blocks), self.voters)
+        tally = VoteTally.objects.get(category_id=self.category.id, candidate_id=self.candidate.id)
+        self.assertEqual(tally.count, self.voters)
+
+    def test_queued_ballots_are_sealed_in_order_after_a_crash(self):
+        queue_path = os.path.join(tempfile.mkdtemp(prefix='votingSystem-test-queue-'), 'ballot_queue.log')
+        with open(queue_path, 'w') as f:
+            # Logged, but its transaction never committed
+            f.write(json.dumps({'id': 'orphan', 'ballot': 'x', 'at': 0}) + '\n')
+        students = [create_student(f'CS{n:04d}', self.department) for n in range(self.voters)]
+        with override_settings(VOTE_QUEUE=True, VOTE_QUEUE_PATH=queue_path):
+            self._vote_in_parallel(students + students[:5])
+            self.assertFalse(Block.objects.exists())
+            self.assertFalse(Student.objects.filter(has_voted=False).exists())
+            with open(queue_path, 'a') as f:
+                f.write('{"id": "torn')
+
+            # A sealer dying mid-block rolls back and the next run replays the same records
+            with mock.patch.object(tally, 'record_block', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError), self.assertLogs('votingSystem.ballot_queue', 'WARNING'):
+                    ballot_queue.seal_pending(batch_size=20)
+            self.assertFalse(Block.objects.exists())
+            with self.assertLogs('votingSystem.ballot_queue', 'WARNING'):
+                call_command('seal_ballots', once=True, batch_size=20, stdout=StringIO())
+
+        blocks = Block.objects.order_by('index')
+        self.assertLinearChain(blocks.count())
+        self.assertEqual(sum(len(unpack_ballots(block.vote_data)) for block in blocks), self.voters)
+        self.assertFalse(QueuedBallot.objects.exists())
+        tally_row = VoteTally.objects.get(category_id=self.category.id, candidate_id=self.candidate.id)
+        self.assertEqual(tally_row.count, self.voters)
+
+
+class BallotQueueTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Computer Science')
+        self.category = Category.objects.create(name='President')
+        self.candidate = Candidate.objects.create(
+            category=self.category, name='Candidate', photo='candidates/candidate.jpg'
+        )
+        self.students = [create_student(f'CS{n:04d}', department) for n in range(3)]
+        queue_path = os.path.join(tempfile.mkdtemp(prefix='votingSystem-test-queue-'), 'ballot_queue.log')
+        queue_settings = override_settings(VOTE_QUEUE=True, VOTE_QUEUE_PATH=queue_path)
+        queue_settings.enable()
+        self.addCleanup(queue_settings.disable)
+
+    def test_undecryptable_ballot_is_quarantined_and_sealing_moves_past_it(self):
+        votes = {self.category.id: self.candidate.id}
+        ballot_queue.enqueue(self.students[0].pk, encrypt_ballot(votes))
+        # Queued under a key that has since been replaced
+        stale = encrypt_ballot(votes, Fernet(Fernet.generate_key()))
+        bad = ballot_queue.enqueue(self.students[1].pk, stale)
+        ballot_queue.enqueue(self.students[2].pk, encrypt_ballot(votes))
+
+        with self.assertLogs('votingSystem.ballot_queue', 'ERROR'):
+            self.assertEqual(ballot_queue.seal_pending(batch_size=10), (2, 0, 1))
+        self.assertEqual(ballot_queue.seal_pending(batch_size=10), (0, 0, 0))
+
+        block = Block.objects.get()
+        self.assertEqual(len(unpack_ballots(block.vote_data)), 2)
+        self.assertEqual(VoteTally.objects.get(candidate_id=self.candidate.id).count, 2)
+        quarantined = QueuedBallot.objects.get()
+        self.assertEqual(quarantined.ballot_id, bad['ballot_id'])
+        self.assertEqual(quarantined.ballot, stale)
+        self.assertIsNotNone(quarantined.failed_at)
+
+
+def reference_root(leaves):
+    # RFC 6962 MTH, computed directly from all leaves
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return merkle.node_hash(reference_root(leaves[:split]), reference_root(leaves[split:]))
+
+
+@test_cache
+class MerkleTreeTests(TestCase):
+    def test_incremental_root_and_proofs_match_reference(self):
+        leaves = [merkle.leaf_hash(f'ballot-{n}') for n in range(37)]
+        size = 0
+        for batch in (1, 1, 3, 1, 7, 2, 22):
+            root = merkle.append_leaves(size, leaves[size:size + batch])
+            size += batch
+            self.assertEqual(root, reference_root(leaves[:size]))
+            self.assertEqual(merkle.root(size), root)
+
+        for tree_size in (1, 2, 5, 16, 37):
+            root = merkle.root(tree_size)
+            for leaf_index in range(tree_size):
+                proof = merkle.inclusion_proof(leaf_index, tree_size)
+                self.assertTrue(merkle.verify_inclusion(leaves[leaf_index], leaf_index, tree_size, proof, root))
+                if tree_size > 1:
+                    wrong_leaf = leaves[leaf_index - 1]
+                    self.assertFalse(merkle.verify_inclusion(wrong_leaf, leaf_index, tree_size, proof, root))
+
+
+@test_cache
+class BallotLookupTests(TestCase):
+    def test_receipt_finds_its_block_and_position(self):
+        first = [encrypt_ballot({1: 1}) for _ in range(3)]
+        second = [encrypt_ballot({1: 2}) for _ in range(4)]
+        chain.append_block(pack_ballots(first))
+        chain.append_block(pack_ballots(second))
+
+        block, position = chain.find_ballot(second[2])
+        self.assertEqual((block.index, position), (2, 2))
+        self.assertEqual(unpack_ballots(block.vote_data)[position], second[2])
+        block, position = chain.find_ballot(first[0])
+        self.assertEqual((block.index, position), (1, 0))
+        self.assertEqual(chain.find_ballot(encrypt_ballot({1: 1})), (None, None))
+
+
+class BlockIndexMigrationTests(TransactionTestCase):
+    before = [('votingSystem', '0005_chain_checkpoint')]
+
+    def test_duplicate_indexes_stop_the_unique_index_migration(self):
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes('votingSystem')
+        executor.migrate(self.before)
+        try:
+            Block = executor.loader.project_state(self.before).apps.get_model('votingSystem', 'Block')
+            for _ in range(2):
+                Block.objects.create(index=3, vote_data='x', previous_hash='0' * 64, hash='a' * 64)
+
+            with self.assertRaisesMessage(RuntimeError, "Blocks share an index (3)"):
+                MigrationExecutor(connection).migrate(latest)
+            self.assertNotIn(('votingSystem', '0006_block_indexes'), MigrationExecutor(connection).loader.applied_migrations)
+            Block.objects.all().delete()
+        finally:
+            MigrationExecutor(connection).migrate(latest)
+
+
+@test_cache
+class VoteTallyTests(TestCase):
+    def _cast(self, votes, record=True):
+        on_append = (lambda block: tally.record_block(block, [votes])) if record else None
+        chain.append_block(encrypt_ballot(votes), on_append=on_append)
+
+    def test_sync_catches_up_from_the_high_water_mark(self):
+        self._cast({1: 1})
+        # Appended without on_append, so the tally has not seen these yet
+        self._cast({1: 2}, record=False)
+        self._cast({1: 1, 2: 5}, record=False)
+        self.assertEqual(TallyState.load().last_index, 1)
+
+        tally.sync()
+        tally.sync()
+        self.assertEqual(TallyState.load().last_index, 3)
+        self.assertEqual(tally.vote_counts(), {1: {1: 2, 2: 1}, 2: {5: 1}})
+
+        # A block recorded after a gap folds the gap in from the chain first
+        self._cast({1: 2}, record=False)
+        self._cast({2: 5})
+        self.assertEqual(TallyState.load().last_index, 5)
+        self.assertEqual(tally.vote_counts(), {1: {1: 2, 2: 2}, 2: {5: 2}})
+
+    def test_rebuild_tally_reports_and_fixes_drift(self):
+        self._cast({1: 1})
+        self._cast({1: 1, 2: 5})
+        VoteTally.objects.filter(category_id=1, candidate_id=1).update(count=7)
+
+        out = StringIO()
+        call_command('rebuild_tally', check=True, stdout=out)
+        self.assertIn("Category 1, candidate 1: tally 7, chain 2", out.getvalue())
+        self.assertIn("1 tally entry drifted from the chain.", out.getvalue())
+        self.assertEqual(VoteTally.objects.get(category_id=1, candidate_id=1).count, 7)
+
+        out = StringIO()
+        call_command('rebuild_tally', stdout=out)
+        self.assertIn("Tally rebuilt up to block 2.", out.getvalue())
+        self.assertEqual(tally.vote_counts(), {1: {1: 2}, 2: {5: 1}})
+
+        out = StringIO()
+        call_command('rebuild_tally', check=True, stdout=out)
+        self.assertIn("Tally matches the chain.", out.getvalue())
+
+
+@test_cache
+class ChainEngineTests(TestCase):
+    def setUp(self):
+        self.ballots = [{1: index % 3 + 1, 2: 7} for index in range(1, 11)]
+        for votes in self.ballots:
+            chain.append_block(encrypt_ballot(votes))
+
+    def test_chunked_verification_and_recount_match_a_serial_run(self):
+        # Block 4 starts the second chunk of three: its broken link is only seen when stitching
+        Block.objects.filter(index=4).update(previous_hash='f' * 64)
+        Block.objects.filter(index=7).update(vote_data=encrypt_ballot({1: 1, 2: 7}))
+
+        serial = engine.verify_range((1, 10))
+        chunked = engine.verify_chain(chunk_size=3)
+        self.assertEqual(chunked['blocks'], serial['blocks'])
+        self.assertEqual(chunked['failures'], serial['failures'])
+        self.assertEqual(chunked['failures'], [
+            (4, ['Hash mismatch', 'Previous hash mismatch']),
+            (7, ['Hash mismatch']),
+        ])
+
+        counts, last_index = engine.recount(chunk_size=3)
+        self.assertEqual(counts, engine.recount_range((1, 10)))
+        self.assertEqual(counts, Counter({(1, 1): 4, (1, 2): 3, (1, 3): 3, (2, 7): 10}))
+        self.assertEqual(last_index, 10)
+
+        out = StringIO()
+        call_command('recount', workers=1, chunk_size=3, stdout=out)
+        self.assertIn("Recounted 10 blocks (up to block 10)", out.getvalue())
+
+
+@test_cache
+class BlockAdminTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(email='admin@staffs.edu', password='adminPass1234')
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:votingSystem_block_changelist')
+
+    def _changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_verify_status_costs_no_queries_per_row(self):
+        chain.append_block(encrypt_ballot({1: 1}))
+        one_row = self._changelist_queries()
+        for _ in range(24):
+            chain.append_block(encrypt_ballot({1: 1}))
+        full_page = self._changelist_queries()
+
+        self.assertEqual(full_page, one_row)
+        self.assertContains(self.client.get(self.url), 'color: green;">Valid', count=25)
+
+    def _page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        changelist = response.context['cl']
+        return [block.index for block in changelist.result_list], changelist, queries
+
+    def test_keyset_pages_walk_both_ways_across_the_boundary(self):
+        for _ in range(30):
+            chain.append_block(encrypt_ballot({1: 1}))
+
+        newest, changelist, queries = self._page()
+        self.assertEqual(newest, list(range(30, 5, -1)))
+        self.assertEqual(changelist.result_count, 30)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertIsNone(changelist.newer_url)
+        self.assertEqual(changelist.older_url, '?before=6')
+
+        older, changelist, _ = self._page(before=6)
+        self.assertEqual(older, [5, 4, 3, 2, 1])
+        self.assertIsNone(changelist.older_url)
+        self.assertEqual(changelist.newer_url, '?after=5')
+        # Every block on exactly one page
+        self.assertEqual(sorted(newest + older), list(range(1, 31)))
+
+        back, changelist, _ = self._page(after=5)
+        self.assertEqual(back, newest)
+
+    def test_hash_search_is_a_prefix_range(self):
+        for _ in range(3):
+            chain.append_block(encrypt_ballot({1: 1}))
+        block = Block.objects.get(index=2)
+
+        found, _, queries = self._page(q=block.hash[:10].upper())
+        # Block 3 links to it through previous_hash
+        self.assertEqual(found, [3, 2])
+        searches = [query['sql'] for query in queries if '"hash" >=' in query['sql']]
+        self.assertTrue(searches)
+        self.assertFalse(any('LIKE' in sql for sql in searches))
+        self.assertEqual(self._page(q='not-hex')[0], [])
+
+
+@test_cache
+class BlockchainVerificationTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(email='admin@staffs.edu', password='adminPass1234')
+        self.client.force_login(admin_user)
+        self.block_admin = admin.site._registry[Block]
+        self._append(5)
+
+    def _append(self, blocks):
+        for _ in range(blocks):
+            chain.append_block(encrypt_ballot({1: 1}))
+
+    def test_incremental_run_resumes_from_the_checkpoint(self):
+        results, summary = self.block_admin._verify_blockchain()
+        self.assertEqual([result['index'] for result in results], [1, 2, 3, 4, 5])
+        self.assertEqual(ChainCheckpoint.objects.get().index, 5)
+
+        self._append(2)
+        results, summary = self.block_admin._verify_blockchain()
+        self.assertEqual([result['index'] for result in results], [5, 6, 7])
+        self.assertEqual((summary['checked'], summary['failures']), (3, 0))
+        self.assertEqual(ChainCheckpoint.objects.order_by('-index').first().index, 7)
+
+    def test_tampering_behind_the_checkpoint_is_caught_by_sampling_and_full_audit(self):
+        self.block_admin._verify_blockchain()
+        Block.objects.filter(index=2).update(vote_data=encrypt_ballot({1: 2}))
+
+        results, summary = self.block_admin._verify_blockchain(sample_size=0)
+        self.assertEqual(summary['failures'], 0)
+        # Sampling every block behind the checkpoint finds it
+        results, summary = self.block_admin._verify_blockchain(sample_size=4)
+        self.assertEqual(sorted(result['index'] for result in results if result.get('sampled')), [1, 2, 3, 4])
+        self.assertEqual(summary['first_failure'], 2)
+
+        response = self.client.post(reverse('admin:votingSystem_block_changelist'), {
+            'action': 'full_blockchain_audit',
+            '_selected_action': [Block.objects.first().pk],
+        })
+        self.assertContains(response, 'first failure at block 2.')
+        # The checkpoint at block 5 vouched for the tampered block
+        self.assertFalse(ChainCheckpoint.objects.exists())
+
+    def test_missing_checkpoint_block_fails_and_rechecks_the_whole_chain(self):
+        self.block_admin._verify_blockchain()
+        self._append(1)
+        Block.objects.filter(index=5).delete()
+
+        results, summary = self.block_admin._verify_blockchain()
+        self.assertEqual((results[0]['index'], results[0]['status']), (5, 'Invalid'))
+        self.assertEqual(results[0].keys(), results[1].keys())
+        self.assertEqual([result['index'] for result in results[1:]], [1, 2, 3, 4, 6])
+        self.assertEqual(results[-1]['errors'], ['Previous hash mismatch'])
+        self.assertIsNone(summary['checkpoint'])
+        self.assertEqual(ChainCheckpoint.objects.get().index, 5)
+
+    def _stream(self, **params):
+        response = self.client.get(reverse('admin:verify_blockchain_stream'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def _ndjson(self, **params):
+        return [json.loads(line) for line in self._stream(format='ndjson', **params).splitlines()]
+
+    def test_ndjson_stream_of_a_clean_chain(self):
+        lines = self._ndjson()
+        self.assertEqual([line['index'] for line in lines[:-1]], [1, 2, 3, 4, 5])
+        self.assertEqual(lines[-1]['summary'], {
+            'full': False, 'checkpoint': None, 'checked': 5, 'sampled': 0, 'failures': 0, 'first_failure': None,
+        })
+
+        # Only failures are sent, but progress still follows the blocks checked
+        with mock.patch('votingSystem.admin.VERIFY_CHUNK_SIZE', 2):
+            lines = self._ndjson(full=1, failures=1)
+        self.assertEqual([line['progress']['checked'] for line in lines[:-1]], [2, 4])
+        self.assertEqual(lines[-1]['summary']['checked'], 5)
+
+    def test_streams_of_a_tampered_chain(self):
+        Block.objects.filter(index=3).update(vote_data=encrypt_ballot({1: 2}))
+
+        lines = self._ndjson(full=1, failures=1)
+        self.assertEqual([(line['index'], line['status']) for line in lines[:-1]], [(3, 'Invalid')])
+        self.assertEqual((lines[-1]['summary']['failures'], lines[-1]['summary']['first_failure']), (1, 3))
+
+        page = self._stream(full=1)
+        self.assertEqual((page.count('color: green;">'), page.count('color: red;">')), (4, 1))
+        self.assertIn('Hash mismatch', page)
+        self.assertIn('first failure at block 3.', page)
+        self.assertTrue(page.rstrip().endswith('</html>'))
+
+
+@test_cache
+class BallotDefinitionTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Computer Science')
+        self.category = Category.objects.create(name='President')
+        self.category.eligible_departments.add(self.department)
+        self.candidate = Candidate.objects.create(
+            category=self.category, name='Candidate', photo='candidates/candidate.jpg'
+        )
+
+    def test_definition_is_cached_until_ballot_changes(self):
+        definitions.for_department(self.department.id)
+        with self.assertNumQueries(0):
+            definition = definitions.for_department(self.department.id)
+        self.assertEqual(definition['eligible'], {self.category.id: {self.candidate.id}})
+
+        other = Candidate.objects.create(category=self.category, name='Other', photo='candidates/other.jpg')
+        definition = definitions.for_department(self.department.id)
+        self.assertEqual(definition['eligible'], {self.category.id: {self.candidate.id, other.id}})
+
+        self.category.eligible_departments.remove(self.department)
+        self.assertEqual(definitions.for_department(self.department.id)['categories'], [])
+
+    def test_vote_rejects_candidate_from_another_category(self):
+        other_category = Category.objects.create(name='Secretary')
+        other_candidate = Candidate.objects.create(
+            category=other_category, name='Other', photo='candidates/other.jpg'
+        )
+        student = create_student('CS0001', self.department)
+        self.client.force_login(student.user)
+        self.client.post(reverse('vote'), {f'category-{self.category.id}': other_candidate.id})
+
+        self.assertFalse(Block.objects.exists())
+        student.refresh_from_db()
+        self.assertFalse(student.has_voted)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='votingSystem-test-media-'))
+    def test_uploaded_photo_is_served_as_thumbnails(self):
+        photo = BytesIO()
+        Image.new('RGB', (1200, 1800), 'navy').save(photo, 'JPEG')
+        self.candidate.photo = SimpleUploadedFile('portrait.jpg', photo.getvalue())
+        self.candidate.save()
+
+        candidate = definitions.for_department(self.department.id)['categories'][0]['candidates'][0]
+        self.assertTrue(candidate['photo']['src'].endswith('/thumbnails/candidates/portrait-80.jpg'))
+        self.assertEqual(candidate['photo']['webp_srcset'].count('.webp'), len(thumbnails.SIZES))
+        with Image.open(os.path.join(settings.MEDIA_ROOT, 'thumbnails/candidates/portrait-160.webp')) as image:
+            self.assertEqual(image.size, (160, 160))
+
+
+@test_cache
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        results_cache._counts.clear()
+
+    def _cast(self, votes):
+        # Commit callbacks publish the new tally high-water mark
+        with self.captureOnCommitCallbacks(execute=True):
+            chain.append_block(encrypt_ballot(votes), on_append=lambda block: tally.record_block(block, [votes]))
+
+    def test_stale_counts_are_served_while_another_process_rebuilds(self):
+        self._cast({1: 1})
+        self.assertEqual(results_cache.get_vote_counts(), {1: {1: 1}})
+        with self.assertNumQueries(0):
+            self.assertEqual(results_cache.get_vote_counts(), {1: {1: 1}})
+
+        self._cast({1: 2})
+        # Another process holds the rebuild lock, so this request must not rebuild too
+        cache.add(results_cache.LOCK_KEY, True)
+        self.assertEqual(results_cache.get_vote_counts(), {1: {1: 1}})
+
+        self.assertEqual(
+            results_cache.stats(),
+            {'hits': 1, 'stale': 1, 'misses': 1, 'rebuilds': 1, 'errors': 0},
+        )
+
+
+@test_cache
+class ResultsDocumentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        department = Department.objects.create(name='Computer Science')
+        self.category = Category.objects.create(name='President')
+        self.candidate = Candidate.objects.create(
+            category=self.category, name='Candidate', photo='candidates/candidate.jpg'
+        )
+        student = create_student('CS0001', department)
+        student.has_voted = True
+        student.save()
+        self.client.force_login(student.user)
+
+    def test_results_json_answers_unchanged_polls_with_304(self):
+        votes = {self.category.id: self.candidate.id}
+        chain.append_block(encrypt_ballot(votes), on_append=lambda block: tally.record_block(block, [votes]))
+        response = self.client.get(reverse('results_json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['categories'][0]['candidates'][0]['votes'], 1)
+
+        response = self.client.get(reverse('results_json'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        Candidate.objects.create(category=self.category, name='Other', photo='candidates/other.jpg')
+        response = self.client.get(reverse('results_json'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['categories'][0]['candidates']), 2)
+
+    def test_results_page_is_rendered_for_every_request(self):
+        # It carries the session's CSRF token, so it must never be answered with a 304
+        etag = self.client.get(reverse('results_json'))['ETag']
+        response = self.client.get(reverse('results'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_results_page_polls_unless_push_is_enabled(self):
+        response = self.client.get(reverse('results'))
+        self.assertNotContains(response, reverse('results_stream'))
+        self.assertContains(response, f'fetch("{reverse("results_json")}"')
+        self.assertEqual(self.client.get(reverse('results_stream')).status_code, 404)
+
+        with override_settings(RESULTS_PUSH_ENABLED=True):
+            response = self.client.get(reverse('results'))
+        self.assertContains(response, f'new EventSource("{reverse("results_stream")}")')
+        self.assertNotContains(response, f'fetch("{reverse("results_json")}"')
+
+    def test_search_uses_the_index_and_live_counts(self):
+        votes = {self.category.id: self.candidate.id}
+        chain.append_block(encrypt_ballot(votes), on_append=lambda block: tally.record_block(block, [votes]))
+        self.candidate.name = 'Kwame Mensah'
+        self.candidate.save()
+
+        with self.assertNumQueries(1):
+            # Only the index rebuild for the renamed candidate
+            search.get_index()
+        response = self.client.get(reverse('results_json'), {'q': 'mens'})
+        self.assertEqual(response.json()['search_results'], [
+            {'name': 'Kwame Mensah', 'category_name': 'President', 'votes': 1},
+        ])
+
+
+class CandidateSearchTests(SimpleTestCase):
+    def test_prefix_substring_and_typo_matches(self):
+        index = search.CandidateIndex([
+            (1, 1, 'Kwame Mensah', 'President'),
+            (2, 1, 'Ama Ménsah-Boateng', 'President'),
+            (3, 2, 'Kofi Asante', 'Secretary'),
+        ])
+
+        def ids(query):
+            return [candidate[0] for candidate in index.search(query)]
+
+        self.assertEqual(ids('KWA'), [1])
+        self.assertEqual(ids('mensah'), [2, 1])
+        self.assertEqual(ids('ama mensah'), [2])
+        self.assertEqual(ids('oate'), [2])
+        self.assertEqual(ids('asantee'), [3])
+        self.assertEqual(ids('kofi mensah'), [])
+
+
+@test_cache
+@override_settings(RESULTS_PUSH_ENABLED=True)
+class LiveResultsTests(TestCase):
+    subscribers = 500
+
+    def setUp(self):
+        cache.clear()
+        live.broadcaster = live.Broadcaster()
+
+    def _cast(self, votes):
+        chain.append_block(encrypt_ballot(votes), on_append=lambda block: tally.record_block(block, [votes]))
+
+    async def test_one_poll_fans_a_vote_out_to_every_subscriber(self):
+        await sync_to_async(self._cast)({1: 1})
+        streams = [live.stream() for _ in range(self.subscribers)]
+        for stream in streams:
+            self.assertIn('event: snapshot', await anext(stream))
+
+        await sync_to_async(self._cast)({1: 2})
+        # Rebuild the shared counts in this thread rather than in the background
+        cache.delete(results_cache.CACHE_KEY)
+        await live.broadcaster.poll()
+        for stream in streams:
+            event = await anext(stream)
+            self.assertIn('event: delta', event)
+            self.assertIn('"category": 1, "candidate": 2, "count": 1', event)
+
+        for stream in streams:
+            await stream.aclose()
+        self.assertEqual(live.broadcaster.subscribers, set())
+
+    async def test_stream_requires_a_voter_or_staff(self):
+        department = await Department.objects.acreate(name='Computer Science')
+        student = await sync_to_async(create_student)('CS0001', department)
+        await self.async_client.aforce_login(student.user)
+        response = await self.async_client.get(reverse('results_stream'))
+        self.assertEqual(response.status_code, 403)
+
+        student.has_voted = True
+        await student.asave()
+        response = await self.async_client.get(reverse('results_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'event: snapshot', await anext(stream))
+        await stream.aclose()
+
+
+@test_cache
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-token')
+class MetricsTests(TestCase):
+    def setUp(self):
+        for metric in core_metrics.REGISTRY:
+            metric.series.clear()
+        student = create_student('CS0001', Department.objects.create(name='Computer Science'))
+        student.has_voted = True
+        student.save()
+        self.client.force_login(student.user)
+
+    def test_views_and_operations_are_exported_to_staff_only(self):
+        self.client.get(reverse('results'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('votingsystem_request_duration_seconds_count{view="results",method="GET"} 1', body)
+        self.assertIn('votingsystem_request_queries_count{view="results"} 1', body)
+        self.assertIn('votingsystem_operation_seconds_count{operation="results_document"} 1', body)
+        self.assertIn('votingsystem_cache_lookups_total{cache="results_document",result="miss"} 1', body)
+        self.assertIn('votingsystem_results_cache_hit_ratio', body)
+
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class BallotFormatTests(SimpleTestCase):
+    def test_binary_ballots_round_trip_and_legacy_json_still_decrypts(self):
+        votes = {1: 26, 2: 300, 12345: 99999}
+        self.assertEqual(decrypt_ballot(encrypt_ballot(votes)), votes)
+        self.assertLess(len(encode_ballot(votes)), len(json.dumps(votes)))
+
+        legacy = get_cipher().encrypt(json.dumps(votes).encode()).decode()
+        self.assertEqual(decrypt_ballot(legacy), votes)
+
+
+class TallyEngineTests(SimpleTestCase):
+    def test_count_blocks_matches_per_ballot_count(self):
+        cipher = get_cipher()
+        ballots = [{1: 11, 2: 21}, {1: 12}, {2: 21, 300: 3001}, {}, {1: 11, 2: 22, 300: 3001}]
+        blocks = [
+            SimpleNamespace(index=1, vote_data=encrypt_ballot(ballots[0], cipher)),
+            # Legacy JSON ballot
+            SimpleNamespace(index=2, vote_data=cipher.encrypt(json.dumps(ballots[1]).encode()).decode()),
+            SimpleNamespace(index=3, vote_data=json.dumps([encrypt_ballot(votes, cipher) for votes in ballots[2:]])),
+            SimpleNamespace(index=4, vote_data='not a ballot'),
+        ]
+        expected = Counter((category_id, candidate_id) for votes in ballots for category_id, candidate_id in votes.items())
+
+        with self.assertLogs('votingSystem.tally', 'WARNING'):
+            counts, last_index = tally.count_blocks(blocks, cipher)
+        self.assertEqual(counts, expected)
+        self.assertEqual(last_index, 4)
+
+
+class AssetServingTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='votingSystem-test-static-')
+        os.makedirs(os.path.join(self.root, 'css'))
+        self.path = os.path.join(self.root, 'css', 'site.css')
+        with open(self.path, 'w') as f:
+            f.write('body { color: navy; }\n' * 100)
+        assets._compress(self.path)
+        self.factory = RequestFactory()
+
+    def serve(self, **headers):
+        with override_settings(STATIC_ROOT=self.root):
+            return assets.serve_static(self.factory.get('/static/css/site.css', headers=headers), 'css/site.css')
+
+    def test_precompressed_variant_etag_and_ranges(self):
+        response = self.serve(accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        with open(self.path + '.gz', 'rb') as f:
+            self.assertEqual(b''.join(response.streaming_content), f.read())
+
+        self.assertEqual(self.serve(accept_encoding='gzip', if_none_match=response['ETag']).status_code, 304)
+        # A validator for the gzip representation does not match the identity one
+        self.assertEqual(self.serve(if_none_match=response['ETag']).status_code, 200)
+
+        response = self.serve(range='bytes=5-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 5-9/2200')
+        self.assertEqual(b''.join(response.streaming_content), b'{ col')
+        self.assertEqual(self.serve(range='bytes=5000-').status_code, 416)
+
+    def test_refused_or_unknown_encodings_get_the_identity_file(self):
+        for accept_encoding in ('gzip;q=0', 'xgzipx', 'identity'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.serve(accept_encoding=accept_encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(b''.join(response.streaming_content), b'body { color: navy; }\n' * 100)
+
+    def test_refused_brotli_falls_back_to_gzip(self):
+        with open(self.path + '.br', 'wb') as f:
+            f.write(b'not really brotli')
+        self.assertEqual(self.serve(accept_encoding='br, gzip')['Content-Encoding'], 'br')
+        self.assertEqual(self.serve(accept_encoding='br;q=0, gzip')['Content-Encoding'], 'gzip')
+        self.assertEqual(self.serve(accept_encoding='br;q=0, *')['Content-Encoding'], 'gzip')
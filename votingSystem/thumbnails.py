@@ -0,0 +1,100 @@
+# votingSystem/thumbnails.py
+"""
+Square WebP and JPEG thumbnails of candidate photos. The ballot shows photos at
+64-80px, so serving the full-resolution uploads wastes megabytes per voter.
+Thumbnails live under MEDIA_ROOT/thumbnails/ with names derived from the photo's
+name, so nothing extra is stored on the Candidate.
+"""
+import logging
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Widths in pixels: the ballot's 64/80px slots at 1x, 2x and 3x
+SIZES = (80, 160, 240)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_name(photo_name, size, extension):
+    stem = os.path.splitext(photo_name)[0]
+    return f"thumbnails/{stem}-{size}.{extension}"
+
+
+def _is_current(name, photo):
+    # Regenerate when a replacement photo reuses the old file name
+    if not default_storage.exists(name):
+        return False
+    try:
+        return default_storage.get_modified_time(name) >= photo.storage.get_modified_time(photo.name)
+    except NotImplementedError:
+        return True
+
+
+def generate(photo, force=False):
+    """Write any missing or outdated thumbnails for ``photo`` (an ImageField file). Returns how many were written."""
+    wanted = [
+        (size, extension) for size in SIZES for extension in FORMATS
+        if force or not _is_current(thumbnail_name(photo.name, size, extension), photo)
+    ]
+    if not wanted:
+        return 0
+    with photo.storage.open(photo.name, 'rb') as f:
+        image = Image.open(f)
+        # Let the JPEG decoder downscale while decoding instead of loading full resolution
+        image.draft('RGB', (max(SIZES) * 2, max(SIZES) * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    for size, extension in wanted:
+        # Same square crop as the ballot's object-cover, biased upwards to keep faces in frame
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS, centering=(0.5, 0.35))
+        pillow_format, options = FORMATS[extension]
+        buffer = BytesIO()
+        thumbnail.save(buffer, pillow_format, **options)
+        name = thumbnail_name(photo.name, size, extension)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    return len(wanted)
+
+
+def generate_safely(photo):
+    # A candidate whose photo file is missing keeps falling back to photo.url
+    if not photo.storage.exists(photo.name):
+        return 0
+    try:
+        return generate(photo)
+    except Exception:
+        logger.exception("Could not build thumbnails for %s", photo.name)
+        return 0
+
+
+def srcsets(photo):
+    """
+    Return {'src', 'srcset', 'webp_srcset'} for a photo, pointing at its thumbnails,
+    or at the original photo alone if they have not been built.
+    """
+    if not photo:
+        return {'src': '', 'srcset': '', 'webp_srcset': ''}
+    names = {
+        extension: [thumbnail_name(photo.name, size, extension) for size in SIZES]
+        for extension in FORMATS
+    }
+    if not all(default_storage.exists(name) for extension_names in names.values() for name in extension_names):
+        return {'src': photo.url, 'srcset': '', 'webp_srcset': ''}
+
+    def srcset(extension):
+        return ', '.join(
+            f"{default_storage.url(name)} {size}w" for name, size in zip(names[extension], SIZES)
+        )
+
+    return {
+        'src': default_storage.url(names['jpg'][0]),
+        'srcset': srcset('jpg'),
+        'webp_srcset': srcset('webp'),
+    }
@@ -6,6 +6,12 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('vote/', views.vote, name='vote'),
     path('results/', views.results, name='results'),
+    path('results.json', views.results_json, name='results_json'),
+    path('results/stream/', views.results_stream, name='results_stream'),
     path('vote-confirmation/', views.vote_confirmation, name='vote_confirmation'),
     path('verify-vote/', views.verify_vote, name='verify_vote'),
+    path('merkle/root/', views.merkle_root, name='merkle_root'),
+    path('merkle/proof/', views.merkle_proof, name='merkle_proof'),
+    path('staff/', views.staff_dashboard, name='staff_dashboard'),
+    path('staff/turnout.json', views.turnout_json, name='turnout_json'),
 ]
\ No newline at end of file
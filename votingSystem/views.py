@@ -1,32 +1,38 @@
 # votingSystem/views.py
-import json
 import hashlib
+import json
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from cryptography.fernet import Fernet
-from django.conf import settings
-from django.core.cache import cache
-from django.http import HttpResponse
-from .models import Block, Category, Candidate
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .models import Block, ChainTip
+from . import ballot_queue, chain, definitions, live, merkle, results_cache, sealing, search
+from .ballots import AlreadyVoted, encrypt_ballot, unpack_ballots
+from account import turnout
+from core import metrics
+from account.backends import forget_user
 from account.models import Student
 from django.utils import timezone
 from datetime import datetime
 
+
 def index(request):
     if not request.user.is_authenticated:
         return redirect('student_login')
 
     if hasattr(request.user, 'staff_profile'):
-        return redirect('results')
+        return redirect('staff_dashboard')
 
     try:
         student = request.user.student_profile
         if student.has_voted:
             messages.info(request, "You have already voted.")
             return redirect('results')
-        categories = Category.objects.filter(eligible_departments__in=[student.department])
-        return render(request, 'dashboard.html', {'categories': categories})
+        definition = definitions.for_department(student.department_id)
+        return render(request, 'dashboard.html', {'categories': definition['categories']})
     except Student.DoesNotExist:
         messages.error(request, "No student profile found for this user.")
         return redirect('student_login')
@@ -43,49 +49,61 @@ def vote(request):
         return redirect('results')
 
     if request.method == 'POST':
-        cipher = Fernet(settings.FERNET_KEY)
-        previous_block = Block.objects.order_by('-index').first()
-        previous_hash = previous_block.hash if previous_block else '0' * 64
-
+        # Validate against the cached ballot definition instead of querying per category
+        eligible = definitions.for_department(student.department_id)['eligible']
         votes = {}
         for key, value in request.POST.items():
             if key.startswith('category-'):
                 category_id = int(key.split('-')[1])
                 candidate_id = int(value)
-                category = Category.objects.get(id=category_id)
-                if student.department not in category.eligible_departments.all():
-                    messages.error(request, f"You are not eligible to vote in {category.name}.")
+                if category_id not in eligible:
+                    messages.error(request, "You are not eligible to vote in this category.")
+                    return redirect('index')
+                if candidate_id not in eligible[category_id]:
+                    messages.error(request, "Invalid candidate selection.")
                     return redirect('index')
                 votes[category_id] = candidate_id
 
-        vote_data = json.dumps(votes)
-        encrypted_vote = cipher.encrypt(vote_data.encode()).decode()
-
-        index = previous_block.index + 1 if previous_block else 1
-        timestamp = timezone.now()
-        timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00')
-        block_data = f"{index}{timestamp_str}{encrypted_vote}{previous_hash}"
-        block_hash = hashlib.sha256(block_data.encode()).hexdigest()
-
-        Block.objects.create(
-            index=index,
-            timestamp=timestamp,
-            vote_data=encrypted_vote,
-            previous_hash=previous_hash,
-            hash=block_hash
-        )
+        # Encrypt before touching the chain so the append's critical section stays short
+        with metrics.timer('ballot_encrypt'):
+            encrypted_vote = encrypt_ballot(votes)
 
+        # has_voted flips in the same transaction that puts the ballot on the chain (or
+        # in the ballot queue), so a double submission can never land two ballots
+        try:
+            if settings.VOTE_QUEUE:
+                with metrics.timer('ballot_enqueue'):
+                    receipt = ballot_queue.enqueue(student.pk, encrypted_vote)
+            else:
+                with metrics.timer('ballot_seal'):
+                    ballot = sealing.submit_ballot(student.pk, votes, encrypted_vote)
+        except AlreadyVoted:
+            forget_user(request.user.pk)
+            messages.info(request, "You have already voted.")
+            return redirect('results')
+        # has_voted flipped through a queryset update, which sends no signals
+        forget_user(request.user.pk)
         student.has_voted = True
-        student.save()
-
-        cache.delete('vote_counts')
 
         # Store vote data in session for one-time confirmation
-        request.session['vote_confirmation'] = {
-            'encrypted_vote': encrypted_vote,
-            'block_hash': block_hash,
-            'timestamp': timestamp_str
-        }
+        if settings.VOTE_QUEUE:
+            # Provisional receipt: the block is only known once the ballot is sealed
+            request.session['vote_confirmation'] = {
+                'encrypted_vote': encrypted_vote,
+                'block_hash': None,
+                'ballot_id': receipt['ballot_id'],
+                'timestamp': chain.format_timestamp(receipt['queued_at'])
+            }
+        else:
+            block = ballot.block
+            request.session['vote_confirmation'] = {
+                'encrypted_vote': encrypted_vote,
+                'block_hash': block.hash,
+                'block_index': block.index,
+                'ballot_position': ballot.position,
+                'ballot_index': block.ballot_offset + ballot.position,
+                'timestamp': chain.format_timestamp(block.timestamp)
+            }
         request.session['vote_confirmation_accessed'] = False
 
         return redirect('vote_confirmation')
@@ -109,11 +127,15 @@ def vote_confirmation(request):
 
     if request.method == 'POST':
         if 'download' in request.POST:
+            block_hash = vote_confirmation['block_hash'] or f"pending (queued ballot {vote_confirmation['ballot_id']})"
             content = (
                 f"Vote Confirmation\n"
                 f"Timestamp: {vote_confirmation['timestamp']}\n"
                 f"Encrypted Vote: {vote_confirmation['encrypted_vote']}\n"
-                f"Block Hash: {vote_confirmation['block_hash']}\n"
+                f"Block Hash: {block_hash}\n"
+                f"Block Index: {vote_confirmation.get('block_index')}\n"
+                f"Ballot Position: {vote_confirmation.get('ballot_position')}\n"
+                f"Ballot Index: {vote_confirmation.get('ballot_index')}\n"
             )
             response = HttpResponse(content, content_type='text/plain')
             response['Content-Disposition'] = 'attachment; filename="vote_confirmation.txt"'
@@ -129,6 +151,10 @@ def vote_confirmation(request):
     context = {
         'encrypted_vote': vote_confirmation['encrypted_vote'],
         'block_hash': vote_confirmation['block_hash'],
+        'ballot_id': vote_confirmation.get('ballot_id'),
+        'block_index': vote_confirmation.get('block_index'),
+        'ballot_position': vote_confirmation.get('ballot_position'),
+        'ballot_index': vote_confirmation.get('ballot_index'),
         'timestamp': vote_confirmation['timestamp']
     }
     return render(request, 'vote_confirmation.html', context)
@@ -147,6 +173,7 @@ def verify_vote(request):
 
         # Check if input is an encrypted vote or hash
         block = None
+        ballot_position = None
         if len(input_value) == 64 and all(c in '0123456789abcdef' for c in input_value.lower()):
             # Likely a hash
             try:
@@ -155,27 +182,43 @@ def verify_vote(request):
                 pass
         else:
             # Likely encrypted vote
-            try:
-                block = Block.objects.get(vote_data=input_value)
-            except Block.DoesNotExist:
-                pass
+            with metrics.timer('ballot_lookup'):
+                block, ballot_position = chain.find_ballot(input_value)
 
         if block:
             # Verify block integrity
-            timestamp_str = block.timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00')
             previous_block = Block.objects.filter(index=block.index - 1).first()
-            previous_hash = previous_block.hash if previous_block else '0' * 64
-            block_data = f"{block.index}{timestamp_str}{block.vote_data}{previous_hash}"
-            calculated_hash = hashlib.sha256(block_data.encode()).hexdigest()
+            previous_hash = previous_block.hash if previous_block else chain.GENESIS_HASH
+            with metrics.timer('block_hash'):
+                calculated_hash = chain.calculate_hash(block.index, block.timestamp, block.vote_data, previous_hash)
             is_valid = calculated_hash == block.hash
             context = {
                 'block': {
                     'index': block.index,
                     'timestamp': block.timestamp,
                     'hash': block.hash,
+                    'ballots': len(unpack_ballots(block.vote_data)),
+                    'ballot_position': ballot_position,
                     'is_valid': is_valid
                 }
             }
+            if ballot_position is not None:
+                # Prove the ballot is included under the currently published Merkle root
+                tip = ChainTip.objects.get(pk=1)
+                leaf_index = block.ballot_offset + ballot_position
+                with metrics.timer('merkle_proof'):
+                    proof = merkle.inclusion_proof(leaf_index, tip.ballots)
+                context['merkle'] = {
+                    'leaf_index': leaf_index,
+                    'tree_size': tip.ballots,
+                    'root': tip.merkle_root,
+                    'proof': proof,
+                    'is_included': merkle.verify_inclusion(
+                        merkle.leaf_hash(input_value), leaf_index, tip.ballots, proof, tip.merkle_root
+                    ),
+                }
+                is_valid = is_valid and context['merkle']['is_included']
+                context['block']['is_valid'] = is_valid
             if is_valid:
                 messages.success(request, "Vote verified successfully: The vote is valid and untampered.")
             else:
@@ -187,6 +230,45 @@ def verify_vote(request):
 
     return render(request, 'verify_vote.html')
 
+@login_required
+def merkle_root(request):
+    tip = ChainTip.objects.filter(pk=1).first()
+    return JsonResponse({
+        'tree_size': tip.ballots if tip else 0,
+        'root': tip.merkle_root if tip else merkle.EMPTY_ROOT,
+        'block_index': tip.index if tip else 0,
+        'block_hash': tip.hash if tip else chain.GENESIS_HASH,
+    })
+
+@login_required
+def merkle_proof(request):
+    """
+    Inclusion proof for one ballot, given by ?vote=<encrypted vote> or ?leaf=<ballot index>.
+    Pass ?tree_size= to prove against an earlier published root instead of the current one.
+    """
+    tip = ChainTip.objects.filter(pk=1).first()
+    current_size = tip.ballots if tip else 0
+    try:
+        tree_size = int(request.GET.get('tree_size', current_size))
+        if 'vote' in request.GET:
+            block, ballot_position = chain.find_ballot(request.GET['vote'])
+            if not block:
+                return JsonResponse({'error': 'No matching vote found.'}, status=404)
+            leaf_index = block.ballot_offset + ballot_position
+        else:
+            leaf_index = int(request.GET['leaf'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Provide a vote or a leaf index.'}, status=400)
+    if not 0 <= leaf_index < tree_size <= current_size:
+        return JsonResponse({'error': 'Leaf or tree size out of range.'}, status=400)
+
+    return JsonResponse({
+        'leaf_index': leaf_index,
+        'tree_size': tree_size,
+        'root': tip.merkle_root if tree_size == current_size else merkle.root(tree_size),
+        'proof': merkle.inclusion_proof(leaf_index, tree_size),
+    })
+
 @login_required
 def results(request):
     # Check access: students who have voted or staff
@@ -200,81 +282,111 @@ def results(request):
             messages.error(request, "Only students who have voted or staff can view results.")
             return redirect('student_login')
 
-    # Initialize Fernet cipher
-    cipher = Fernet(settings.FERNET_KEY)
-
-    # Check cache for vote counts
-    cache_key = 'vote_counts'
-    vote_counts = cache.get(cache_key)
-    if not vote_counts:
-        vote_counts = {}
-        for block in Block.objects.all():
-            try:
-                decrypted_data = cipher.decrypt(block.vote_data.encode()).decode()
-                votes = json.loads(decrypted_data)
-                for category_id, candidate_id in votes.items():
-                    category_id = int(category_id)
-                    candidate_id = int(candidate_id)
-                    if category_id not in vote_counts:
-                        vote_counts[category_id] = {}
-                    vote_counts[category_id][candidate_id] = vote_counts[category_id].get(candidate_id, 0) + 1
-            except Exception as e:
-                print(f"Decryption error for block {block.index}: {e}")
-                continue
-        cache.set(cache_key, vote_counts, timeout=3600)  # Cache for 1 hour
+    # Rendered every time (no ETag): the page carries the session's CSRF token and
+    # any flashed messages; /results.json is the cheap endpoint for polling
+    with metrics.timer('results_document'):
+        document, _ = results_cache.get_document()
 
     # Get search query
     search_query = request.GET.get('q', '').strip().lower()
 
-    # Get categories and candidates
-    categories = Category.objects.all()
-
-    # Prepare results data
-    results = []
-    total_votes = {}
+    # Prepare search results (separate from main results)
+    search_results = _search_results(search_query) if search_query else []
 
-    for category in categories:
-        # Calculate total votes for the category
-        total_votes[category.id] = sum(vote_counts.get(category.id, {}).values())
+    # Time the counts were last updated
+    current_time = datetime.fromtimestamp(
+        document['built_at'], timezone.get_current_timezone()
+    ).strftime("%B %d, %Y, %I:%M %p GMT")
 
-        category_data = {
-            'name': category.name,
-            'candidates': []
+    return render(request, 'results.html', {
+        'results': document['categories'],
+        'search_results': search_results,
+        'search_query': search_query,
+        'current_time': current_time,
+        'push_enabled': settings.RESULTS_PUSH_ENABLED,
+        'poll_interval': settings.RESULTS_POLL_INTERVAL,
+    })
+
+
+def _search_results(query):
+    # One lookup in the in-memory name index, with live counts from the cached tally
+    counts = results_cache.get_vote_counts()
+    with metrics.timer('candidate_search'):
+        matches = search.search(query)
+    return [
+        {
+            'name': name,
+            'category_name': category_name,
+            'votes': counts.get(category_id, {}).get(candidate_id, 0),
         }
-        candidates = category.candidate_set.all()
+        for candidate_id, category_id, name, category_name in matches
+    ]
 
-        for candidate in candidates:
-            vote_count = vote_counts.get(category.id, {}).get(candidate.id, 0)
-            percentage = (vote_count / total_votes[category.id] * 100) if total_votes[category.id] > 0 else 0
-            category_data['candidates'].append({
-                'name': candidate.name,
-                'photo': candidate.photo.url,
-                'votes': vote_count,
-                'percentage': percentage
-            })
 
-        if category_data['candidates']:
-            results.append(category_data)
+def _may_view_results(user):
+    if user.is_staff:
+        return True
+    student = getattr(user, 'student_profile', None)
+    return student is not None and student.has_voted
 
-    # Prepare search results (separate from main results)
-    search_results = []
+
+def _with_etag(request, etag, build_response):
+    # Answer If-None-Match with a 304 without building the body
+    response = get_conditional_response(request, etag=etag) or build_response()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def staff_dashboard(request):
+    if not request.user.is_staff:
+        # Not back to index: that sends anyone with a staff profile here again
+        return HttpResponse("Only staff can view turnout.", status=403)
+    return render(request, 'adminDashboard.html', {
+        'turnout': turnout.summary(),
+        'poll_interval': settings.TURNOUT_POLL_INTERVAL,
+    })
+
+
+@login_required
+def turnout_json(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': "Only staff can view turnout."}, status=403)
+    # Read from the per-group counters: one small query, however many students
+    summary = turnout.summary()
+    etag = '"%s"' % hashlib.md5(json.dumps(summary, sort_keys=True).encode()).hexdigest()
+    return _with_etag(request, etag, lambda: JsonResponse(summary))
+
+
+@login_required
+def results_json(request):
+    if not _may_view_results(request.user):
+        return JsonResponse({'error': "Only students who have voted or staff can view results."}, status=403)
+    document, etag = results_cache.get_document()
+    search_query = request.GET.get('q', '').strip()
     if search_query:
-        for category in categories:
-            candidates = category.candidate_set.filter(name__icontains=search_query)
-            for candidate in candidates:
-                vote_count = vote_counts.get(category.id, {}).get(candidate.id, 0)
-                search_results.append({
-                    'name': candidate.name,
-                    'category_name': category.name,
-                    'votes': vote_count
-                })
-
-    # Current timestamp
-    current_time = datetime.now(timezone.get_current_timezone()).strftime("%B %d, %Y, %I:%M %p GMT")
+        search_digest = hashlib.md5(search_query.lower().encode()).hexdigest()[:8]
+        return _with_etag(
+            request, f'{etag[:-1]}-{search_digest}"',
+            lambda: JsonResponse({'query': search_query, 'search_results': _search_results(search_query)}),
+        )
+    return _with_etag(request, etag, lambda: JsonResponse(document))
 
-    return render(request, 'results.html', {
-        'results': results,
-        'search_results': search_results,
-        'search_query': search_query,
-        'current_time': current_time
-    })
\ No newline at end of file
+
+@login_required
+async def results_stream(request):
+    """
+    Server-Sent Events feed of the tally: a snapshot of every count, then only the
+    (category, candidate, count) entries that change as blocks are appended. Only
+    served with RESULTS_PUSH_ENABLED, i.e. through core.asgi; under WSGI each open
+    stream would pin a worker.
+    """
+    if not settings.RESULTS_PUSH_ENABLED:
+        raise Http404("Live results push is not enabled.")
+    if not await sync_to_async(_may_view_results)(request.user):
+        return JsonResponse({'error': "Only students who have voted or staff can view results."}, status=403)
+    response = StreamingHttpResponse(live.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response